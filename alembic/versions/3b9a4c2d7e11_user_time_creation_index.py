@@ -0,0 +1,23 @@
+"""Index users by creation time for keyset pagination
+
+Revision ID: 3b9a4c2d7e11
+Revises: 05f1bade6edc
+Create Date: 2026-10-18 10:12:31.482913
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9a4c2d7e11'
+down_revision = '05f1bade6edc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_time_creation_id', 'user', ['time_creation', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_time_creation_id', table_name='user')
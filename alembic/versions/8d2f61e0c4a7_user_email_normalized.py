@@ -0,0 +1,55 @@
+"""Add the normalized email of users
+
+Revision ID: 8d2f61e0c4a7
+Revises: 3b9a4c2d7e11
+Create Date: 2026-10-18 14:37:02.118460
+
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.user import normalize_email
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f61e0c4a7'
+down_revision = '3b9a4c2d7e11'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('email_normalized', sa.String(), nullable=True))
+
+    # normalized in python: the lower() of sqlite only folds ASCII
+    connection = op.get_bind()
+    user = sa.table('user', sa.column('id'), sa.column('email'), sa.column('email_normalized'))
+    rows = connection.execute(sa.select([user.c.id, user.c.email])).fetchall()
+    normalized = [{"_id": id, "_email": normalize_email(email)} for id, email in rows]
+
+    # the unique index cannot be created on emails that only differ by case
+    users = defaultdict(list)
+    for (id, email), row in zip(rows, normalized):
+        if row["_email"] is not None:
+            users[row["_email"]].append(f"{email} (id {id})")
+    duplicates = [", ".join(emails) for emails in users.values() if len(emails) > 1]
+    if duplicates:
+        raise RuntimeError(
+            "Users share the same email in different cases, merge or rename them before upgrading:\n"
+            + "\n".join(duplicates)
+        )
+
+    if normalized:
+        connection.execute(
+            user.update().where(user.c.id == sa.bindparam('_id')).values(email_normalized=sa.bindparam('_email')),
+            normalized,
+        )
+    op.create_index(op.f('ix_user_email_normalized'), 'user', ['email_normalized'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_user_email_normalized'), table_name='user')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('email_normalized')
@@ -0,0 +1,40 @@
+"""Add the email outbox
+
+Revision ID: c41e7a9b2f53
+Revises: 8d2f61e0c4a7
+Create Date: 2026-10-18 16:12:45.503817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9b2f53'
+down_revision = '8d2f61e0c4a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'emailoutbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email_to', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=True),
+        sa.Column('html', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('failed', sa.Boolean(), nullable=False),
+        sa.Column('time_creation', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_emailoutbox_id'), 'emailoutbox', ['id'], unique=False)
+    op.create_index('ix_emailoutbox_failed_next_attempt', 'emailoutbox', ['failed', 'next_attempt'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_emailoutbox_failed_next_attempt', table_name='emailoutbox')
+    op.drop_index(op.f('ix_emailoutbox_id'), table_name='emailoutbox')
+    op.drop_table('emailoutbox')
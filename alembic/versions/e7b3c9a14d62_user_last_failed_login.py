@@ -0,0 +1,25 @@
+"""Store the time of the last failed login of users
+
+Revision ID: e7b3c9a14d62
+Revises: c41e7a9b2f53
+Create Date: 2026-10-18 18:05:27.341906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3c9a14d62'
+down_revision = 'c41e7a9b2f53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('last_failed_login', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('last_failed_login')
@@ -1,9 +1,10 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import login, users, utils, me
+from app.api.api_v1.endpoints import async_users, login, users, utils, me
 
 api_router = APIRouter()
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(me.router, tags=["me"])
 api_router.include_router(utils.router, prefix="/utils", tags=["utils"])
+api_router.include_router(async_users.router, prefix="/async", tags=["async"])
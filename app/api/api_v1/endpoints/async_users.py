@@ -0,0 +1,129 @@
+"""
+Async endpoints: /async/*
+
+Same as the login, /me and /users endpoints, but served from the event loop
+through the async database layer instead of the threadpool.
+"""
+import math
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy_mixins import ModelNotFoundError
+
+from app.api.utils.security import (
+    async_get_current_active_superuser,
+    async_get_current_active_user,
+    create_token,
+)
+from app.core import config
+from app.core.throttle import login_throttle
+from app.db.base_class import ModelExistError
+from app.models.user import User as UserModel
+from app.schemas.token import Token
+from app.schemas.user import User, UserCreateFull
+from app.utils import send_new_account_email
+
+
+router = APIRouter()
+
+
+@router.post("/login/access-token", response_model=Token)
+async def login_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
+):
+    """OAuth2 compatible token login, get an access token for future requests"""
+    client = request.client.host if request.client else ""
+
+    retry_after = login_throttle.retry_after(form_data.username, client)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+    user = await UserModel.async_authenticate(
+        email=form_data.username,
+        password=form_data.password
+    )
+    if not user:
+        login_throttle.failure(form_data.username, client)
+    else:
+        login_throttle.success(form_data.username)
+
+    if not user or not user["is_active"]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect email or password")
+    return {
+        "access_token": create_token(user["id"]),
+        "token_type": "bearer",
+    }
+
+
+@router.get("/me", response_model=User)
+async def read_user_me(
+    *,
+    current_user: Dict = Depends(async_get_current_active_user),
+):
+    """Get current user."""
+    return current_user
+
+
+@router.get("/users/", response_model=List[User])
+async def read_users(
+    *,
+    page: int = 0,
+    limit: int = 20,
+    current_user: Dict = Depends(async_get_current_active_superuser),
+):
+    """Retrieve users."""
+    return await UserModel.async_all_by_page(page=page, limit=limit)
+
+
+@router.post("/users/", response_model=User)
+async def create_user(
+    *,
+    user_in: UserCreateFull,
+    current_user: Dict = Depends(async_get_current_active_superuser),
+):
+    """Create new user."""
+    try:
+        user = await UserModel.async_create(user_in)
+    except ModelExistError:
+        raise HTTPException(
+            status_code=400,
+            detail="The user with this username already exists in the system.",
+        )
+    if config.EMAILS_ENABLED and user_in.email:
+
+        # if not password was given, we send a magiclink by email
+        if not user_in.password:
+            token = await UserModel.async_generate_password(email=user_in.email)
+        else:
+            token = None
+
+        await run_in_threadpool(
+            send_new_account_email,
+            email_to=user_in.email,
+            username=user_in.email,
+            token=token,
+        )
+    return user
+
+
+@router.get("/users/{user_id}", response_model=User)
+async def read_user_by_id(
+    *,
+    user_id: int,
+    current_user: Dict = Depends(async_get_current_active_superuser),
+):
+    """Get a specific user by id."""
+    try:
+        return await UserModel.async_find_or_fail(user_id)
+    except ModelNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The user with this username does not exist in the system",
+        )
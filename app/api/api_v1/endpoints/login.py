@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Body, Depends, HTTPException
+import math
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import status
 
 from app.api.utils.security import get_current_user, create_token
+from app.core.throttle import login_throttle
 from app.models.user import User as UserModel
 from app.schemas.user import UserUpdate
 from app.schemas.msg import Msg
@@ -20,13 +23,31 @@ router = APIRouter()
 
 @router.post("/login/access-token", response_model=Token)
 def login_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """OAuth2 compatible token login, get an access token for future requests"""
+    # the proxy address unless uvicorn runs with --proxy-headers
+    client = request.client.host if request.client else ""
+
+    # throttled attempts are rejected before checking the password
+    retry_after = login_throttle.retry_after(form_data.username, client)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
     user = UserModel.authenticate(
         email=form_data.username,
         password=form_data.password
     )
+    if not user:
+        login_throttle.failure(form_data.username, client)
+    else:
+        login_throttle.success(form_data.username)
+
     # we do not send information about disabled users to avoid informations leaks
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect email or password")
@@ -60,7 +81,7 @@ def test_token(current_user: UserModel = Depends(get_current_user)):
 @router.post("/password-recovery/{email}", response_model=Msg)
 def recover_password(email: str):
     """Password Recovery"""
-    user = UserModel.get(email=email)
+    user = UserModel.get_by_email(email)
 
     if user:
         password_reset_token = generate_password_reset_token(email=email)
@@ -80,7 +101,7 @@ def reset_password(token: str = Body(...), new_password: str = Body(...)):
     if not email:
         raise HTTPException(status_code=400, detail="Invalid token")
 
-    user = UserModel.get(email=email)
+    user = UserModel.get_by_email(email)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=404,
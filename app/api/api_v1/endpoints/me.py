@@ -34,8 +34,6 @@ def update_user_me(
     current_user: UserModel = Depends(get_current_active_user),
 ):
     """Update myself"""
-    user = UserModel.find(current_user.id)
-
     if user_in.password:
 
         # updating a non-set password is forbidden
@@ -52,14 +50,14 @@ def update_user_me(
                 detail="You must provide the old password",
             )
 
-        if not user.authenticate(old_password):
+        if not current_user.verify_password(old_password):
             raise HTTPException(
                 status_code=400,
                 detail="Old password is invalid",
             )
 
-    user.update(user_in)
-    return user
+    current_user.update(user_in)
+    return current_user
 
 
 # TODO: test actual deletion
@@ -103,7 +101,7 @@ def validate_email(
 
     (old_email, new_email) = decoded_token
 
-    user = UserModel.where(email=old_email).first()
+    user = UserModel.get_by_email(old_email)
 
     if user is None:
         raise HTTPException(
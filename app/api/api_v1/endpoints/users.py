@@ -2,23 +2,37 @@
 Users endpoint: /users/*
 
 TODO: refactor errors (code repetition)
-TODO: add pagination in headers
 """
-from typing import List
+from typing import AsyncIterator, List, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy_mixins import ModelNotFoundError
 
 from app.db.base_class import ModelExistError
+from app.db.pagination import InvalidCursorError
+from app.db.session import engine
+from app.api.utils.encoders import RowEncoder
+from app.api.utils.pagination import pagination_headers
 from app.api.utils.security import get_current_active_superuser
+from app.api.utils.streaming import iter_lines, iter_records, stream_rows
 from app.core import config
 from app.models.user import User as UserModel
-from app.schemas.user import User, UserCreate, UserUpdateFull, UserCreateFull
+from app.schemas.user import User, UserCreate, UserCreateFull, UserImportProgress, UserUpdateFull
 from app.utils import send_new_account_email
 
 
 router = APIRouter()
 
+user_encoder = RowEncoder(User)
+
+# never export the password hashes
+EXPORT_COLUMNS = (
+    "id", "email", "full_name", "is_active", "is_superuser", "password_set", "time_creation", "time_updated",
+)
+
 
 # -----------------------------------------------------------------------------
 # Helpers
@@ -62,6 +76,43 @@ def _get_account_or_error(user_id: int):
     return user
 
 
+async def _import_batch(batch: List[Tuple[int, UserCreateFull]], progress: UserImportProgress) -> str:
+    """Insert the batch and return the progress line"""
+    if batch:
+        created, errors = await UserModel.async_import(batch)
+        progress.created += created
+        progress.failed += len(errors)
+        progress.errors += errors
+    line = progress.json() + "\n"
+    progress.errors = []
+    return line
+
+
+async def _import_accounts(stream: AsyncIterator[bytes], csv_format: bool) -> AsyncIterator[str]:
+    """Import the users of the stream, yield the progress after each batch"""
+    progress = UserImportProgress()
+    batch = []
+    async for line, record, error in iter_records(iter_lines(stream), csv_format):
+        progress.processed += 1
+        try:
+            if error:
+                raise ValueError(error)
+            batch.append((line, UserCreateFull(**record)))
+        except ValidationError as e:
+            progress.failed += 1
+            progress.errors += [{"line": line, **err} for err in e.errors()]
+        except ValueError as e:
+            progress.failed += 1
+            progress.errors.append({"line": line, "loc": [], "msg": str(e), "type": "value_error.format"})
+
+        if len(batch) >= config.USERS_IMPORT_BATCH_SIZE:
+            yield await _import_batch(batch, progress)
+            batch = []
+
+    progress.done = True
+    yield await _import_batch(batch, progress)
+
+
 # -----------------------------------------------------------------------------
 # Endpoints
 # -----------------------------------------------------------------------------
@@ -69,13 +120,40 @@ def _get_account_or_error(user_id: int):
 @router.get("/", response_model=List[User])
 def read_users(
     *,
-    page: int = 0,
+    request: Request,
+    cursor: str = None,
+    order_by: str = "id",
+    page: int = Query(None, ge=1),
     limit: int = 20,
     current_user: UserModel = Depends(get_current_active_superuser),
 ):
-    """Retrieve users."""
-    users = UserModel.all_by_page(page=page, limit=limit)
-    return users
+    """Retrieve users.
+
+    The total is sent in the X-Total-Count header and the other pages in the
+    Link header. The cursors of the next and previous pages are also sent in
+    the X-Next-Cursor and X-Prev-Cursor headers. `page` is kept for
+    compatibility, it is slower on deep pages.
+    """
+    limit = max(min(limit, config.PAGINATION_MAX_LIMIT), 1)
+    total = UserModel.count_all()
+    # only the listed columns are loaded, and encoded without validation
+    if page is not None:
+        users = UserModel.all_by_page(page=page, limit=limit, columns=user_encoder.columns)
+        headers = pagination_headers(request, total, limit, page=page)
+    else:
+        try:
+            users, next_cursor, prev_cursor = UserModel.all_by_cursor(
+                cursor, limit=limit, order_by=order_by, columns=user_encoder.columns
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        headers = pagination_headers(request, total, limit, next_cursor, prev_cursor)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        if prev_cursor:
+            headers["X-Prev-Cursor"] = prev_cursor
+
+    return Response(user_encoder.encode(users), media_type="application/json", headers=headers)
 
 
 # TODO: handle password set or not
@@ -104,6 +182,52 @@ def create_user_open(
     return _create_account(user_in, open_registration=True)
 
 
+@router.post("/import", response_class=StreamingResponse)
+async def import_users(
+    *,
+    request: Request,
+    current_user: UserModel = Depends(get_current_active_superuser),
+):
+    """Create users from a NDJSON or CSV body (with a header line).
+
+    Rows are validated as they are received and inserted by batches. The
+    progress is streamed back as NDJSON after each batch, with the errors and
+    their line number. No email is sent to the imported users.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("text/csv"):
+        csv_format = True
+    elif content_type.startswith(("application/x-ndjson", "application/jsonlines")):
+        csv_format = False
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send application/x-ndjson or text/csv",
+        )
+    return StreamingResponse(
+        _import_accounts(request.stream(), csv_format),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_users(
+    *,
+    format: str = "ndjson",
+    current_user: UserModel = Depends(get_current_active_superuser),
+):
+    """Export all the users as NDJSON or CSV, ordered by id."""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use the ndjson or csv format")
+    table = UserModel.__table__
+    query = select([table.c[name] for name in EXPORT_COLUMNS]).order_by(table.c.id)
+    return StreamingResponse(
+        stream_rows(engine, query, csv_format=format == "csv", fetch_size=config.USERS_EXPORT_FETCH_SIZE),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+
 @router.get("/{user_id}", response_model=User)
 def read_user_by_id(
     *,
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic.networks import EmailStr
 
 from app.api.utils.security import get_current_active_superuser
 # from app.core.celery_app import celery_app
+from app.core.outbox import outbox_worker
+from app.core.security import hasher
+from app.db.pool import InstrumentedQueuePool
+from app.db.session import engine
+from app.schemas.metrics import DbPoolStats, EmailOutboxStats, PasswordHasherStats
 from app.schemas.msg import Msg
 # from app.schemas.user import User
 from app.models.user import User as DBUser
@@ -31,3 +36,32 @@ def test_email(
     """
     send_test_email(email_to=email_to)
     return {"msg": "Test email sent"}
+
+
+@router.get("/password-hasher/", response_model=PasswordHasherStats)
+def password_hasher_stats(current_user: DBUser = Depends(get_current_active_superuser)):
+    """
+    Password hashing pool statistics.
+    """
+    return hasher.stats()
+
+
+@router.get("/db-pool/", response_model=DbPoolStats)
+def db_pool_stats(current_user: DBUser = Depends(get_current_active_superuser)):
+    """
+    Database connection pool statistics.
+    """
+    if not isinstance(engine.pool, InstrumentedQueuePool):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The database does not use a connection pool",
+        )
+    return engine.pool.stats()
+
+
+@router.get("/email-outbox/", response_model=EmailOutboxStats)
+def email_outbox_stats(current_user: DBUser = Depends(get_current_active_superuser)):
+    """
+    Emails waiting in the outbox and delivery counters of this process.
+    """
+    return outbox_worker.stats()
@@ -1,5 +1,14 @@
-# from starlette.requests import Request
+from starlette.requests import Request
 
 
 # def get_db(request: Request):
 #     return request.state.db
+
+
+def no_db(request: Request) -> None:
+    """Declare that the route does not use the database, the session is left
+    untouched at the end of the request.
+    Example:
+        @router.get("/ping", dependencies=[Depends(no_db)])
+    """
+    request.state.no_db = True
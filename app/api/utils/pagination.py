@@ -0,0 +1,41 @@
+import math
+from typing import Dict, Optional
+
+from starlette.requests import Request
+
+
+def pagination_headers(
+    request: Request,
+    total: int,
+    limit: int,
+    next_cursor: Optional[str] = None,
+    prev_cursor: Optional[str] = None,
+    page: Optional[int] = None,
+) -> Dict[str, str]:
+    """Return X-Total-Count and a RFC 5988 Link header for a listing response.
+
+    Links point to the next and previous cursors, or to the first, previous,
+    next and last pages when a page number is given.
+    """
+    links = {}
+    if page is not None:
+        last = max(math.ceil(total / limit), 1)
+        links["first"] = 1
+        if page > 1:
+            links["prev"] = min(page - 1, last)
+        if page < last:
+            links["next"] = page + 1
+        links["last"] = last
+        urls = {rel: request.url.include_query_params(page=n, limit=limit) for rel, n in links.items()}
+    else:
+        url = request.url.remove_query_params("cursor")
+        urls = {"first": url.include_query_params(limit=limit)}
+        if prev_cursor:
+            urls["prev"] = url.include_query_params(cursor=prev_cursor, limit=limit)
+        if next_cursor:
+            urls["next"] = url.include_query_params(cursor=next_cursor, limit=limit)
+
+    return {
+        "X-Total-Count": str(total),
+        "Link": ", ".join(f'<{url}>; rel="{rel}"' for rel, url in urls.items()),
+    }
@@ -1,4 +1,5 @@
 from datetime import timedelta
+from typing import Dict
 
 import jwt
 
@@ -26,20 +27,24 @@ def create_token(user_id: int):
     )
 
 
-def get_current_user(
-    token: str = Security(reusable_oauth2)
-):
-    # TODO: user model
+def _decode_token(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(token, config.SECRET_KEY, algorithms=[ALGORITHM])
-        token_data = TokenPayload(**payload)
+        return TokenPayload(**payload)
     except PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials"
         )
+
+
+def get_current_user(
+    token: str = Security(reusable_oauth2)
+):
+    # TODO: user model
+    token_data = _decode_token(token)
     # TODO: this code sequence is repeated many times in the app — refactor it
     try:
-        user = UserModel.find_or_fail(token_data.user_id)
+        user = UserModel.find_cached(token_data.user_id)
     except ModelNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
@@ -57,3 +62,32 @@ def get_current_active_superuser(current_user: UserModel = Security(get_current_
             status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+# -----------------------------------------------------------------------------
+# Async versions, the current user is a dict
+# -----------------------------------------------------------------------------
+
+async def async_get_current_user(
+    token: str = Security(reusable_oauth2)
+) -> Dict:
+    token_data = _decode_token(token)
+    try:
+        user = await UserModel.async_find_or_fail(token_data.user_id)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+async def async_get_current_active_user(current_user: Dict = Security(async_get_current_user)) -> Dict:
+    if not current_user["is_active"]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    return current_user
+
+
+async def async_get_current_active_superuser(current_user: Dict = Security(async_get_current_user)) -> Dict:
+    if not current_user["is_superuser"] or not current_user["is_active"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have enough privileges"
+        )
+    return current_user
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+from app.api.utils.encoders import json_default
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Split a streamed body into numbered lines, without reading it all"""
+    buffer = b""
+    number = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line.decode("utf-8", errors="replace").rstrip("\r")
+    if buffer:
+        yield number + 1, buffer.decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_records(
+    lines: AsyncIterator[Tuple[int, str]],
+    csv_format: bool = False,
+) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Parse NDJSON lines, or CSV lines with a header, into dicts.
+
+    Yield the line number, the record and None, or the line number, None and
+    the parsing error. Empty lines and empty CSV values are skipped. CSV
+    values cannot contain line breaks.
+    """
+    header = None
+    async for number, line in lines:
+        if not line.strip():
+            continue
+        if not csv_format:
+            yield (number, *_parse_json(line))
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield number, None, f"{len(header)} values are expected"
+        else:
+            yield number, {k: v for k, v in zip(header, values) if v != ""}, None
+
+
+def _parse_json(line: str) -> Tuple[Optional[Dict], Optional[str]]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, "Invalid JSON"
+    if not isinstance(record, dict):
+        return None, "A JSON object is expected"
+    return record, None
+
+
+def stream_rows(engine: Engine, query: Select, csv_format: bool = False, fetch_size: int = 1000) -> Iterator[str]:
+    """Encode the rows of the query as NDJSON or CSV, `fetch_size` rows at a time.
+
+    Rows are read from a server-side cursor when the driver has one (Postgres)
+    and encoded from tuples, so the memory does not grow with the table.
+    """
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(query)
+        keys = result.keys()
+        if csv_format:
+            yield _csv_lines([keys])
+        while True:
+            rows = result.fetchmany(fetch_size)
+            if not rows:
+                break
+            if csv_format:
+                yield _csv_lines(rows)
+            else:
+                yield "".join(json.dumps(dict(zip(keys, row)), default=json_default) + "\n" for row in rows)
+
+
+def _csv_lines(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
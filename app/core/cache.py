@@ -0,0 +1,99 @@
+"""In-process caches
+
+Each process holds its own caches: a change made through another worker is
+seen once the entry expires.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+
+from app.core import config
+
+
+class SnapshotCache:
+    """Thread safe TTL/LRU cache of compact snapshots (plain dicts).
+
+    A ttl or a maxsize of 0 disables the cache.
+    Example:
+        cache.set(5, {"id": 5, "email": "mymail@fastapi.test"})
+        cache.get(5)
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.enabled = maxsize > 0 and ttl > 0
+        self._cache = TTLCache(maxsize=max(maxsize, 1), ttl=max(ttl, 1))
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            snapshot = self._cache.get(key)
+        return dict(snapshot) if snapshot is not None else None
+
+    def set(self, key: Hashable, snapshot: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._cache[key] = dict(snapshot)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+class CountCache:
+    """Thread safe TTL cache of row counts.
+
+    Counts are adjusted when rows are created or deleted and expire `ttl`
+    seconds after they were counted, which bounds the drift from rolled back
+    transactions and other processes. A ttl of 0 disables the cache.
+    Example:
+        cache.set("user", 120)
+        cache.incr("user")
+    """
+
+    def __init__(self, ttl: int, timer: Callable[[], float] = time.monotonic):
+        self.enabled = ttl > 0
+        self.ttl = ttl
+        self.timer = timer
+        self._counts: Dict[Hashable, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            count, expires = self._counts.get(key, (None, 0))
+            if count is None or expires <= self.timer():
+                self._counts.pop(key, None)
+                return None
+            return count
+
+    def set(self, key: Hashable, count: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts[key] = (count, self.timer() + self.ttl)
+
+    def incr(self, key: Hashable, delta: int = 1) -> None:
+        """Adjust a cached count, unknown counts are left to the next query"""
+        with self._lock:
+            if key in self._counts:
+                count, expires = self._counts[key]
+                self._counts[key] = (max(count + delta, 0), expires)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+# authenticated users, keyed by user id
+user_cache = SnapshotCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+
+# total rows of the listings, keyed by table name
+count_cache = CountCache(ttl=config.COUNT_CACHE_TTL)
@@ -1,3 +1,4 @@
+import os
 import secrets
 
 from envparse import env
@@ -18,11 +19,45 @@ SENTRY_DSN = env.str("SENTRY_DSN", default="")
 
 SQLALCHEMY_DATABASE_URI = env.str("DATABASE_URL", default="sqlite:///./sqlite.db")
 
-# sqlite need special parameters
-if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
-    SQLALCHEMY_CONNECT_ARGS = {"check_same_thread": False}
-else:
-    SQLALCHEMY_CONNECT_ARGS = {}  # pragma: no cover
+# used by async endpoints, through aiosqlite or asyncpg
+ASYNC_DATABASE_URI = env.str("ASYNC_DATABASE_URL", default=SQLALCHEMY_DATABASE_URI)
+
+# read replicas separated by commas, used by GET and HEAD requests
+DATABASE_REPLICA_URLS = env.list("DATABASE_REPLICA_URLS", default=[])
+# seconds before retrying a replica that is down
+DB_REPLICA_RETRY_INTERVAL = env.int("DB_REPLICA_RETRY_INTERVAL", default=30)
+# seconds during which a client that wrote reads from the primary
+DB_REPLICA_STICKY_SECONDS = env.int("DB_REPLICA_STICKY_SECONDS", default=5)
+
+# maximum number of items per page in listings
+PAGINATION_MAX_LIMIT = env.int("PAGINATION_MAX_LIMIT", default=100)
+# total counts of the listings are cached per process, 0 to count every time
+COUNT_CACHE_TTL = env.int("COUNT_CACHE_TTL", default=60)
+# use the planner statistics instead of COUNT(*) on Postgres
+COUNT_APPROXIMATE = env.bool("COUNT_APPROXIMATE", default=False)
+
+# sqlite profile applied on each connection (see app.db.sqlite), an empty
+# string keeps the sqlite default
+SQLITE_JOURNAL_MODE = env.str("SQLITE_JOURNAL_MODE", default="WAL")
+SQLITE_SYNCHRONOUS = env.str("SQLITE_SYNCHRONOUS", default="NORMAL")
+# milliseconds a write waits for the lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = env.int("SQLITE_BUSY_TIMEOUT", default=5000)
+SQLITE_MMAP_SIZE = env.int("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024)
+# negative values are in KiB
+SQLITE_CACHE_SIZE = env.int("SQLITE_CACHE_SIZE", default=-64000)
+SQLITE_TEMP_STORE = env.str("SQLITE_TEMP_STORE", default="MEMORY")
+
+# connection pool, the size, timeout and recycle settings are not used with
+# sqlite, the pings are
+DB_POOL_SIZE = env.int("DB_POOL_SIZE", default=5)
+DB_MAX_OVERFLOW = env.int("DB_MAX_OVERFLOW", default=10)
+DB_POOL_TIMEOUT = env.int("DB_POOL_TIMEOUT", default=30)
+# seconds before a connection is replaced, -1 to keep it forever
+DB_POOL_RECYCLE = env.int("DB_POOL_RECYCLE", default=-1)
+# ping the connection on every checkout...
+DB_POOL_PRE_PING = env.bool("DB_POOL_PRE_PING", default=True)
+# ...or only when it was idle for more than this number of seconds
+DB_POOL_PING_INTERVAL = env.int("DB_POOL_PING_INTERVAL", default=0)
 
 
 SMTP_TLS = env.bool("SMTP_TLS", default=True)
@@ -30,36 +65,92 @@ SMTP_PORT = env.int("SMTP_PORT", default=587)
 SMTP_HOST = env.str("SMTP_HOST", default="localhost")
 SMTP_USER = env.str("SMTP_USER")
 SMTP_PASSWORD = env.str("SMTP_PASSWORD")
+# idle SMTP connections kept open per process (0 to close them after use),
+# closed after IDLE_TIMEOUT seconds, checked with a NOOP after CHECK_AFTER
+SMTP_POOL_SIZE = env.int("SMTP_POOL_SIZE", default=4)
+SMTP_POOL_IDLE_TIMEOUT = env.int("SMTP_POOL_IDLE_TIMEOUT", default=60)
+SMTP_POOL_CHECK_AFTER = env.int("SMTP_POOL_CHECK_AFTER", default=5)
 EMAILS_FROM_EMAIL = env.str("EMAILS_FROM_EMAIL", default="root@localhost")
 EMAILS_FROM_NAME = PROJECT_NAME
 EMAIL_RESET_TOKEN_EXPIRE_HOURS = env.int("EMAIL_RESET_TOKEN_EXPIRE_HOURS", default=24)
 EMAIL_CONFIRMATION_TOKEN_EXPIRE_HOURS = env.int("EMAIL_CONFIRMATION_TOKEN_EXPIRE_HOURS", default=24)
 EMAIL_TEMPLATES_DIR = "app/email-templates/build"
 EMAILS_ENABLED = SMTP_HOST and SMTP_PORT and EMAILS_FROM_EMAIL
+# emails are written in the outbox table with the request and sent by a
+# worker (see app.core.outbox), False sends them during the request
+EMAILS_OUTBOX = env.bool("EMAILS_OUTBOX", default=True)
+# drain the outbox in each web process, False to run scripts/outbox_worker.py
+EMAILS_OUTBOX_WORKER = env.bool("EMAILS_OUTBOX_WORKER", default=True)
+EMAILS_OUTBOX_BATCH_SIZE = env.int("EMAILS_OUTBOX_BATCH_SIZE", default=50)
+# seconds between two polls of an empty outbox
+EMAILS_OUTBOX_POLL_INTERVAL = env.float("EMAILS_OUTBOX_POLL_INTERVAL", default=2.0)
+# attempts before an email is marked as failed, retried after BACKOFF seconds
+# doubled at each failure, up to BACKOFF_MAX
+EMAILS_OUTBOX_MAX_ATTEMPTS = env.int("EMAILS_OUTBOX_MAX_ATTEMPTS", default=8)
+EMAILS_OUTBOX_BACKOFF = env.int("EMAILS_OUTBOX_BACKOFF", default=30)
+EMAILS_OUTBOX_BACKOFF_MAX = env.int("EMAILS_OUTBOX_BACKOFF_MAX", default=3600)
+# seconds a claimed email is hidden from the other workers while it is sent
+EMAILS_OUTBOX_LEASE = env.int("EMAILS_OUTBOX_LEASE", default=300)
 
 FIRST_SUPERUSER = env.str("FIRST_SUPERUSER")
 FIRST_SUPERUSER_PASSWORD = env.str("FIRST_SUPERUSER_PASSWORD")
 
 USERS_OPEN_REGISTRATION = env.bool("USERS_OPEN_REGISTRATION", default=False)
 USERS_PASSWORDLESS_REGISTRATION = env.bool("USERS_PASSWORDLESS_REGISTRATION", default=True)
+# users inserted per transaction by the import endpoint
+USERS_IMPORT_BATCH_SIZE = env.int("USERS_IMPORT_BATCH_SIZE", default=500)
+# rows fetched at once by the export endpoint
+USERS_EXPORT_FETCH_SIZE = env.int("USERS_EXPORT_FETCH_SIZE", default=1000)
 
 EMAIL_TEST_USER = env.str("EMAIL_TEST_USER", default="test2@fastapi.test")
 PASS_TEST_USER = env.str("PASS_TEST_USER", default="test")
 
 FASTAPI_ENV = env.str("FASTAPI_ENV", default="development")
 
+# send the query count and time of each request in a Server-Timing header
+SQL_SERVER_TIMING = env.bool("SQL_SERVER_TIMING", default=FASTAPI_ENV != "production")
+# warn when a request runs the same statement this number of times (likely
+# N+1 queries), 0 to disable
+SQL_REPEATED_THRESHOLD = env.int(
+    "SQL_REPEATED_THRESHOLD", default=0 if FASTAPI_ENV == "production" else 5
+)
+
 # security
 MIN_PASSWORD_LENGTH = env.int("MIN_PASSWORD_LENGTH", default=8)
 SECRET_KEY = env.str("SECRET_KEY", default=secrets.token_urlsafe(32))
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 8  # 60 minutes * 24 hours * 8 days = 8 days
+# failed logins allowed per account and per client address during the period,
+# further attempts are rejected without checking the password (0 to disable).
+# Behind a proxy, the client address needs uvicorn --proxy-headers (see README)
+LOGIN_THROTTLE_PERIOD = env.int("LOGIN_THROTTLE_PERIOD", default=300)
+LOGIN_ACCOUNT_MAX_FAILURES = env.int("LOGIN_ACCOUNT_MAX_FAILURES", default=5)
+LOGIN_CLIENT_MAX_FAILURES = env.int("LOGIN_CLIENT_MAX_FAILURES", default=50)
+# consecutive failures stored in database before locking the account (0 to disable)
+LOGIN_MAX_RETRY = env.int("LOGIN_MAX_RETRY", default=10)
+LOGIN_LOCK_DURATION = env.int("LOGIN_LOCK_DURATION", default=900)
+# authenticated users are cached per process, set the TTL to 0 to disable it
+USER_CACHE_TTL = env.int("USER_CACHE_TTL", default=30)
+USER_CACHE_SIZE = env.int("USER_CACHE_SIZE", default=10000)
+# bcrypt runs in a pool of processes, 0 worker hashes in the request thread
+PASSWORD_HASH_WORKERS = env.int("PASSWORD_HASH_WORKERS", default=os.cpu_count() or 1)
+# pending hashes before answering 503, 0 for no limit
+PASSWORD_HASH_MAX_QUEUE = env.int("PASSWORD_HASH_MAX_QUEUE", default=64)
 PASSWORD_DB_PATH = env.str("PASSWORD_DB_PASS", default='data/pwned-passwords-v5.bin')
 PASSWORD_PWNED_CHECK = env.bool("PASSWORD_PWNED_CHECK", default=True)
+# optional in-memory pre-filter of the pwned passwords database, empty to disable
+PASSWORD_FILTER_PATH = env.str("PASSWORD_FILTER_PATH", default="")
+# used to build the filter: the memory budget wins over the false positive rate
+PASSWORD_FILTER_FP_RATE = env.float("PASSWORD_FILTER_FP_RATE", default=0.01)
+PASSWORD_FILTER_MAX_BYTES = env.int("PASSWORD_FILTER_MAX_BYTES", default=1024 ** 3)
 PASSWORD_MATCH_REG = env.str(
     "PASSWORD_MATCH_REG",
     default=r"^(\s|\w|[-$#\"|\\+%=/<>@^_{}~*:;!?&'])+$"
 )
 
-RANDOM_WORD_FILE = 'data/dict/four-chars.fr.txt'
+# word lists used for temporary passwords, one word per line, by locale
+# e.g. RANDOM_WORD_FILES=fr=data/dict/four-chars.fr.txt,en=data/dict/four-chars.en.txt
+RANDOM_WORD_FILES = env.dict("RANDOM_WORD_FILES", default={"fr": "data/dict/four-chars.fr.txt"})
+RANDOM_WORD_LOCALE = env.str("RANDOM_WORD_LOCALE", default="fr")
 
 # Sending email that point to the frontend
 FRONTEND_HOST = env.str('FRONTEND_HOST', default='http://localhost:8080')
@@ -0,0 +1,143 @@
+"""Email delivery
+
+Requests write their emails in the outbox table (see EmailOutbox) instead of
+waiting for the SMTP server. The worker claims them by batches, sends a
+batch on one SMTP connection, deletes what was sent and schedules a new
+attempt with an exponential backoff for the rest.
+
+The connection comes from the SMTP pool of the process (see app.core.smtp).
+Several workers can drain the same outbox: a claimed email is hidden from
+the others for EMAILS_OUTBOX_LEASE seconds.
+"""
+import logging
+import threading
+from typing import Callable, ContextManager, Dict, Optional
+
+import emails
+from emails.backend.smtp.backend import SMTPBackend
+
+from app.core import config
+from app.core.smtp import smtp_pool
+from app.models.email_outbox import EmailOutbox
+
+
+def backoff_delay(attempts: int, base: float, maximum: float) -> float:
+    """Seconds before the next attempt after `attempts` failures"""
+    return min(base * 2 ** (attempts - 1), maximum)
+
+
+class OutboxWorker:
+    """Send the emails of the outbox from a background thread.
+    Example:
+        worker = OutboxWorker(batch_size=50, poll_interval=2)
+        worker.start()
+        worker.drain()  # or a single batch, from the calling thread
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int = 8,
+        backoff: float = 30,
+        backoff_max: float = 3600,
+        lease: int = 300,
+        backend_factory: Callable[[], ContextManager[SMTPBackend]] = smtp_pool.connection,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.backend_factory = backend_factory
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._sent = 0
+        self._retried = 0
+        self._failed = 0
+
+    def _send(self, backend: SMTPBackend, email: Dict) -> Optional[str]:
+        """Send one email, return the error if it failed"""
+        message = emails.Message(
+            subject=email["subject"],
+            html=email["html"],
+            mail_from=(config.EMAILS_FROM_NAME, config.EMAILS_FROM_EMAIL),
+        )
+        try:
+            response = message.send(to=email["email_to"], smtp=backend)
+        except Exception as e:
+            return repr(e)
+        if response is not None and not response.success:
+            return repr(response.error) if response.error else f"{response.status_code} {response.status_text}"
+        return None
+
+    def _failure(self, email: Dict, error: str) -> None:
+        failed = email["attempts"] >= self.max_attempts
+        delay = backoff_delay(email["attempts"], self.backoff, self.backoff_max)
+        EmailOutbox.retry(email["id"], error, delay, failed=failed)
+        with self._lock:
+            if failed:
+                self._failed += 1
+            else:
+                self._retried += 1
+        logging.warning(f"email {email['id']} to {email['email_to']}, attempt {email['attempts']}: {error}")
+
+    def drain(self) -> int:
+        """Send one batch, return the number of emails claimed"""
+        batch = EmailOutbox.claim(self.batch_size, self.lease)
+        if not batch:
+            return 0
+        sent = []
+        with self.backend_factory() as backend:
+            for email in batch:
+                error = self._send(backend, email)
+                if error is None:
+                    sent.append(email["id"])
+                else:
+                    self._failure(email, error)
+        EmailOutbox.delivered(sent)
+        with self._lock:
+            self._sent += len(sent)
+        return len(batch)
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self.drain()
+            except Exception as e:
+                logging.error(f"email outbox: {e}")
+                claimed = 0
+            # a full batch means that more emails are waiting
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict:
+        """Return the depth of the outbox and the counters of this worker"""
+        with self._lock:
+            counters = {"sent": self._sent, "retried": self._retried, "given_up": self._failed}
+        return {**EmailOutbox.depth(), **counters, "running": self._thread is not None}
+
+
+outbox_worker = OutboxWorker(
+    batch_size=config.EMAILS_OUTBOX_BATCH_SIZE,
+    poll_interval=config.EMAILS_OUTBOX_POLL_INTERVAL,
+    max_attempts=config.EMAILS_OUTBOX_MAX_ATTEMPTS,
+    backoff=config.EMAILS_OUTBOX_BACKOFF,
+    backoff_max=config.EMAILS_OUTBOX_BACKOFF_MAX,
+    lease=config.EMAILS_OUTBOX_LEASE,
+)
@@ -0,0 +1,387 @@
+"""Pwned passwords lookups
+
+The pwnedpass database (see https://pypi.org/project/pwnedpass/) starts with
+a prefix table: one 8 bytes pointer for each 3 bytes SHA-1 prefix. It is
+followed by the sorted entries, made of the 17 remaining bytes of the hash
+and a 4 bytes count.
+
+The file is memory-mapped once per process and never read through file
+objects: the pages live in the page cache and are shared by all the workers.
+A lookup reads two pointers from the table and scans a single bucket
+(~30 entries on the full corpus).
+
+Most passwords are not in the corpus: a Bloom filter built offline from the
+database can answer "not breached" from memory, the database is only read
+when the filter matches. Build it with:
+
+    python -m app.core.pwned build-filter
+
+The whole database can also be converted to a compact corpus of truncated
+hashes, a fraction of the size of the original file (see
+PwnedPasswordCorpus):
+
+    python -m app.core.pwned build-compact --hash-bytes 8
+"""
+import argparse
+import logging
+import math
+import mmap
+import struct
+from functools import lru_cache
+from typing import Iterable, Iterator, Tuple, Union
+
+PREFIX_SIZE = 3
+POINTER_SIZE = 8
+PREFIX_TABLE_SIZE = POINTER_SIZE * 256 ** PREFIX_SIZE
+LAST_PREFIX = 256 ** PREFIX_SIZE - 1
+
+SHA1_SIZE = 20
+ENTRY_HASH_SIZE = SHA1_SIZE - PREFIX_SIZE
+COUNT_SIZE = 4
+ENTRY_SIZE = ENTRY_HASH_SIZE + COUNT_SIZE
+
+
+class PwnedPasswordIndex:
+    """Read-only, memory-mapped pwnedpass database.
+    Example:
+        index = PwnedPasswordIndex("data/pwned-passwords-v5.bin")
+        index.count(hashlib.sha1(b"azerty123").digest())
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < PREFIX_TABLE_SIZE:
+            self._map.close()
+            raise ValueError(f"{path} is not a pwnedpass database")
+        # lookups jump around: read-ahead would only pollute the page cache
+        if hasattr(mmap, "MADV_RANDOM"):
+            self._map.madvise(mmap.MADV_RANDOM)
+
+    def _pointer(self, prefix: int) -> int:
+        offset = prefix * POINTER_SIZE
+        pointer = int.from_bytes(self._map[offset:offset + POINTER_SIZE], byteorder="big")
+        return pointer + PREFIX_TABLE_SIZE
+
+    def _bucket(self, prefix: int) -> Tuple[int, int]:
+        """Return the start and end offsets of the entries of a prefix"""
+        start = self._pointer(prefix)
+        end = len(self._map) if prefix == LAST_PREFIX else self._pointer(prefix + 1)
+        return start, end
+
+    def count(self, digest: bytes) -> int:
+        """Return how many times the SHA-1 digest was found in breaches"""
+        if len(digest) != SHA1_SIZE:
+            raise ValueError(f"digest must be a sha1 digest, got {digest!r}")
+
+        start, end = self._bucket(int.from_bytes(digest[:PREFIX_SIZE], byteorder="big"))
+        rest = digest[PREFIX_SIZE:]
+        position = self._map.find(rest, start, end)
+        while position != -1:
+            # a match could overlap two entries
+            if (position - start) % ENTRY_SIZE == 0:
+                count = position + ENTRY_HASH_SIZE
+                return int.from_bytes(self._map[count:count + COUNT_SIZE], byteorder="big")
+            position = self._map.find(rest, position + 1, end)
+        return 0
+
+    def __contains__(self, digest: bytes) -> bool:
+        return self.count(digest) > 0
+
+    def __len__(self) -> int:
+        return (len(self._map) - PREFIX_TABLE_SIZE) // ENTRY_SIZE
+
+    def digests(self) -> Iterator[bytes]:
+        """Iterate over all the digests, in order"""
+        chunk = 256 ** 2
+        for first in range(0, LAST_PREFIX + 1, chunk):
+            last = first + chunk - 1
+            # skip ranges of empty prefixes at once
+            if self._bucket(first)[0] == self._bucket(last)[1]:
+                continue
+            for prefix in range(first, last + 1):
+                head = prefix.to_bytes(PREFIX_SIZE, byteorder="big")
+                start, end = self._bucket(prefix)
+                for position in range(start, end, ENTRY_SIZE):
+                    yield head + self._map[position:position + ENTRY_HASH_SIZE]
+
+    def close(self) -> None:
+        self._map.close()
+
+
+class PwnedPasswordFilter:
+    """Bloom filter of SHA-1 digests.
+
+    A digest that is not in the filter is not in the database. A digest in
+    the filter might be in the database, false positives happen at the rate
+    chosen when building it. SHA-1 being uniform, the bit positions are
+    derived from the digest itself (double hashing).
+    Example:
+        bloom = PwnedPasswordFilter.build(index.digests(), len(index), 0.01)
+        bloom.save("data/pwned-passwords.bloom")
+    """
+
+    MAGIC = b"PWBF"
+    HEADER = struct.Struct(">4sBQQ")  # magic, hashes, size in bits, items
+
+    def __init__(self, bits, size: int, hashes: int, items: int = 0):
+        self.bits = bits
+        self.size = size
+        self.hashes = hashes
+        self.items = items
+
+    @staticmethod
+    def parameters(items: int, fp_rate: float, max_bytes: int = 0) -> Tuple[int, int]:
+        """Return the size in bits and the number of hashes of a filter"""
+        items = max(items, 1)
+        size = math.ceil(-items * math.log(fp_rate) / math.log(2) ** 2)
+        if max_bytes:
+            size = min(size, max_bytes * 8)
+        hashes = max(1, round(size / items * math.log(2)))
+        return size, hashes
+
+    @classmethod
+    def build(
+        cls,
+        digests: Iterable[bytes],
+        items: int,
+        fp_rate: float,
+        max_bytes: int = 0,
+    ) -> "PwnedPasswordFilter":
+        size, hashes = cls.parameters(items, fp_rate, max_bytes)
+        bloom = cls(bytearray((size + 7) // 8), size, hashes)
+        for digest in digests:
+            bloom.add(digest)
+        return bloom
+
+    @classmethod
+    def load(cls, path: str) -> "PwnedPasswordFilter":
+        """Map a filter file in memory, shared with the other workers"""
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, hashes, size, items = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or len(data) < cls.HEADER.size + (size + 7) // 8:
+            data.close()
+            raise ValueError(f"{path} is not a pwned passwords filter")
+        return cls(memoryview(data)[cls.HEADER.size:], size, hashes, items)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.hashes, self.size, self.items))
+            f.write(self.bits)
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        first = int.from_bytes(digest[:8], byteorder="big")
+        step = int.from_bytes(digest[8:16], byteorder="big") | 1
+        for i in range(self.hashes):
+            yield (first + i * step) % self.size
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.items += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(digest)
+        )
+
+    def false_positive_rate(self) -> float:
+        """Expected false positive rate for the current content"""
+        return (1 - math.exp(-self.hashes * self.items / self.size)) ** self.hashes
+
+
+class PwnedPasswordCorpus:
+    """Compact, read-only corpus of truncated SHA-1 digests.
+
+    Only the first `hash_bytes` bytes (6 to 10) of each digest are kept. The
+    sorted keys are split in blocks of `block_size` keys: the first key of a
+    block is stored in the block index, the others as varint deltas from the
+    previous key. A lookup is a binary search in the index and the decoding
+    of a single block. Breach counts are not kept.
+
+    Truncation introduces false matches: an unknown password matches when its
+    truncated digest equals one of the stored keys, with a probability of
+    `items / 256 ** hash_bytes` (see false_match_rate). For the ~555M hashes
+    of the v5 corpus: 2e-6 with 6 bytes, 3e-11 with 8 bytes, 5e-16 with 10.
+
+    File layout: header, blocks, then the block index (first key, offset).
+    Example:
+        PwnedPasswordCorpus.build(index.digests(), "data/pwned-passwords.compact")
+        corpus = PwnedPasswordCorpus("data/pwned-passwords.compact")
+    """
+
+    MAGIC = b"PWCC"
+    # magic, hash bytes, keys per block, items, blocks, index offset
+    HEADER = struct.Struct(">4sBHQQQ")
+    MIN_HASH_BYTES = 6
+    MAX_HASH_BYTES = 10
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.hash_bytes, self.block_size, self.items, self.blocks, self._index = \
+            self.HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a compact pwned passwords corpus")
+        self._index_entry = self.hash_bytes + POINTER_SIZE
+
+    @staticmethod
+    def false_match_rate(items: int, hash_bytes: int) -> float:
+        """Probability for an unknown digest to match a stored key"""
+        return items / 256 ** hash_bytes
+
+    @staticmethod
+    def _varint(value: int) -> bytes:
+        encoded = bytearray()
+        while value > 0x7f:
+            encoded.append(value & 0x7f | 0x80)
+            value >>= 7
+        encoded.append(value)
+        return bytes(encoded)
+
+    @classmethod
+    def build(
+        cls,
+        digests: Iterable[bytes],
+        path: str,
+        hash_bytes: int = 8,
+        block_size: int = 128,
+    ) -> None:
+        """Write the corpus of the sorted digests to path"""
+        if not cls.MIN_HASH_BYTES <= hash_bytes <= cls.MAX_HASH_BYTES:
+            raise ValueError(f"hash_bytes must be between {cls.MIN_HASH_BYTES} and {cls.MAX_HASH_BYTES}")
+
+        index = bytearray()
+        items = 0
+        previous = None
+        with open(path, "wb") as f:
+            f.seek(cls.HEADER.size)
+            for digest in digests:
+                key = int.from_bytes(digest[:hash_bytes], byteorder="big")
+                # truncated digests can collide
+                if key == previous:
+                    continue
+                if items % block_size == 0:
+                    index += key.to_bytes(hash_bytes, byteorder="big")
+                    index += f.tell().to_bytes(POINTER_SIZE, byteorder="big")
+                else:
+                    f.write(cls._varint(key - previous))
+                previous = key
+                items += 1
+
+            index_offset = f.tell()
+            f.write(index)
+            f.seek(0)
+            blocks = len(index) // (hash_bytes + POINTER_SIZE)
+            f.write(cls.HEADER.pack(cls.MAGIC, hash_bytes, block_size, items, blocks, index_offset))
+
+    def _index_entry_at(self, block: int) -> Tuple[int, int]:
+        start = self._index + block * self._index_entry
+        middle = start + self.hash_bytes
+        key = int.from_bytes(self._map[start:middle], byteorder="big")
+        offset = int.from_bytes(self._map[middle:middle + POINTER_SIZE], byteorder="big")
+        return key, offset
+
+    def __contains__(self, digest: bytes) -> bool:
+        target = int.from_bytes(digest[:self.hash_bytes], byteorder="big")
+
+        # last block starting with a key lower or equal to the target
+        low, high = 0, self.blocks
+        while low < high:
+            middle = (low + high) // 2
+            if self._index_entry_at(middle)[0] <= target:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return False
+        key, position = self._index_entry_at(low - 1)
+
+        remaining = min(self.block_size, self.items - (low - 1) * self.block_size) - 1
+        while key < target and remaining:
+            delta = shift = 0
+            while True:
+                byte = self._map[position]
+                position += 1
+                delta |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            key += delta
+            remaining -= 1
+        return key == target
+
+    def __len__(self) -> int:
+        return self.items
+
+    def close(self) -> None:
+        self._map.close()
+
+
+@lru_cache(maxsize=None)
+def get_pwned_index(path: str) -> Union[PwnedPasswordIndex, PwnedPasswordCorpus]:
+    """Return the database, opened once per process. Both formats are accepted."""
+    logging.info(f"mapping pwned passwords database {path}")
+    with open(path, "rb") as f:
+        magic = f.read(len(PwnedPasswordCorpus.MAGIC))
+    if magic == PwnedPasswordCorpus.MAGIC:
+        return PwnedPasswordCorpus(path)
+    return PwnedPasswordIndex(path)
+
+
+@lru_cache(maxsize=None)
+def get_pwned_filter(path: str) -> PwnedPasswordFilter:
+    """Return the filter, loaded once per process"""
+    logging.info(f"mapping pwned passwords filter {path}")
+    return PwnedPasswordFilter.load(path)
+
+
+def build_filter(args: argparse.Namespace) -> None:
+    index = PwnedPasswordIndex(args.database)
+    bloom = PwnedPasswordFilter.build(index.digests(), len(index), args.fp_rate, args.max_bytes)
+    bloom.save(args.output)
+    print(
+        f"{bloom.items} digests, {len(bloom.bits)} bytes, {bloom.hashes} hashes, "
+        f"expected false positive rate {bloom.false_positive_rate():.4%}"
+    )
+
+
+def build_compact(args: argparse.Namespace) -> None:
+    index = PwnedPasswordIndex(args.database)
+    PwnedPasswordCorpus.build(index.digests(), args.output, args.hash_bytes, args.block_size)
+    corpus = PwnedPasswordCorpus(args.output)
+    rate = corpus.false_match_rate(len(corpus), corpus.hash_bytes)
+    print(f"{len(corpus)} keys of {corpus.hash_bytes} bytes, false match rate {rate:.2e}")
+
+
+def main() -> None:
+    from app.core import config
+
+    parser = argparse.ArgumentParser(description="Pwned passwords database tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("build-filter", help="build the Bloom filter of the database")
+    command.add_argument("--database", default=config.PASSWORD_DB_PATH)
+    command.add_argument("--output", default=config.PASSWORD_FILTER_PATH or "data/pwned-passwords.bloom")
+    command.add_argument("--fp-rate", type=float, default=config.PASSWORD_FILTER_FP_RATE)
+    command.add_argument("--max-bytes", type=int, default=config.PASSWORD_FILTER_MAX_BYTES)
+    command.set_defaults(func=build_filter)
+
+    command = commands.add_parser("build-compact", help="build a compact corpus of truncated hashes")
+    command.add_argument("--database", default=config.PASSWORD_DB_PATH)
+    command.add_argument("--output", default="data/pwned-passwords.compact")
+    command.add_argument("--hash-bytes", type=int, default=8)
+    command.add_argument("--block-size", type=int, default=128)
+    command.set_defaults(func=build_compact)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
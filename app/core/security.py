@@ -1,12 +1,169 @@
-# from passlib.context import CryptContext
+"""Password hashing
 
-# # TODO: secret?
-# pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+bcrypt is CPU bound: hashes are computed in a bounded pool of worker
+processes so that login bursts use every core instead of starving the
+threadpool that serves every other endpoint.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Sequence, Tuple
 
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 
-# def verify_password(plain_password: str, hashed_password: str) -> bool:
-#     return pwd_context.verify(plain_password, hashed_password)
+from app.core import config
 
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# def get_password_hash(password: str) -> str:
-#     return pwd_context.hash(password)
+
+class PasswordHasherBusyError(RuntimeError):
+    """Too many hashes are already waiting for a worker"""
+    pass
+
+
+# Worker functions must be importable to be sent to the process pool.
+# They return their own timing so that the queue wait can be measured.
+def _hash(password: str) -> Tuple[str, float, float]:
+    start = time.time()
+    hashed = pwd_context.hash(password)
+    return hashed, start, time.time()
+
+
+def _verify(password: str, hashed_password: str) -> Tuple[bool, float, float]:
+    start = time.time()
+    valid = pwd_context.verify(password, hashed_password)
+    return valid, start, time.time()
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a pool of processes.
+
+    With `workers=0` the hash is computed in the calling thread, or in the
+    threadpool for the async methods.
+    `max_queue` limits the number of pending hashes (0 for no limit).
+    Example:
+        hashed = hasher.hash("greatpassword")
+        valid = await hasher.verify_async("greatpassword", hashed)
+    """
+
+    def __init__(self, workers: int = 0, max_queue: int = 0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._errors = 0
+        self._queue_wait = 0.0
+        self._hash_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # a forked process cannot reuse the pool of its parent
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def _submit(self, func: Callable, *args) -> Future:
+        with self._lock:
+            if self.max_queue and self._pending >= self.max_queue:
+                self._rejected += 1
+                raise PasswordHasherBusyError("Too many passwords waiting to be hashed")
+            self._pending += 1
+            submitted = time.time()
+            executor = self._get_executor() if self.workers else None
+
+        if executor:
+            future = executor.submit(func, *args)
+        else:
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        future.add_done_callback(partial(self._done, submitted))
+        return future
+
+    def _done(self, submitted: float, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future.exception():
+                self._errors += 1
+                return
+            _, start, end = future.result()
+            self._completed += 1
+            self._queue_wait += max(start - submitted, 0)
+            self._hash_time += end - start
+
+    async def _submit_async(self, func: Callable, *args) -> Tuple:
+        if self.workers:
+            return await asyncio.wrap_future(self._submit(func, *args))
+        # without pool the hash runs in the threadpool, not on the event loop
+        return await run_in_threadpool(lambda: self._submit(func, *args).result())
+
+    def hash(self, password: str) -> str:
+        """Return the hash of the password"""
+        return self._submit(_hash, password).result()[0]
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Check that the password matches the hash"""
+        return self._submit(_verify, password, hashed_password).result()[0]
+
+    async def hash_async(self, password: str) -> str:
+        """Return the hash of the password without blocking the event loop"""
+        result = await self._submit_async(_hash, password)
+        return result[0]
+
+    async def hash_many_async(self, passwords: Sequence[str]) -> List[str]:
+        """Return the hashes of the passwords, computed in parallel.
+        At most two hashes per worker are queued at once so that the batch
+        does not fill the queue for the other requests.
+        """
+        concurrency = max(self.workers, 1) * 2
+        if self.max_queue:
+            concurrency = max(min(concurrency, self.max_queue // 2), 1)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def hash(password):
+            async with semaphore:
+                return await self.hash_async(password)
+
+        return list(await asyncio.gather(*(hash(p) for p in passwords)))
+
+    async def verify_async(self, password: str, hashed_password: str) -> bool:
+        """Check the password without blocking the event loop"""
+        result = await self._submit_async(_verify, password, hashed_password)
+        return result[0]
+
+    def stats(self) -> Dict:
+        """Return the counters and the average queue wait and hash time (ms)"""
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "errors": self._errors,
+                "queue_wait_avg_ms": self._queue_wait / completed * 1000,
+                "hash_time_avg_ms": self._hash_time / completed * 1000,
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+
+hasher = PasswordHasher(
+    workers=config.PASSWORD_HASH_WORKERS,
+    max_queue=config.PASSWORD_HASH_MAX_QUEUE,
+)
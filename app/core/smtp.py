@@ -0,0 +1,160 @@
+"""SMTP connection pool
+
+Opening a SMTP session costs a TCP connection, a TLS handshake and an AUTH
+round trip, most of the time of a send. The pool keeps the authenticated
+connections of a process open between messages:
+- a connection idle for more than `idle_timeout` seconds is closed, before
+  the server drops it;
+- a connection idle for more than `check_after` seconds is checked with a
+  NOOP before being reused, and replaced if the server does not answer.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from emails.backend.smtp.backend import SMTPBackend
+
+from app.core import config
+
+
+def smtp_options() -> Dict:
+    """Connection parameters of the SMTP server"""
+    options = {"host": config.SMTP_HOST, "port": config.SMTP_PORT}
+    if config.SMTP_TLS:
+        options["tls"] = True
+    if config.SMTP_USER:
+        options["user"] = config.SMTP_USER
+    if config.SMTP_PASSWORD:
+        options["password"] = config.SMTP_PASSWORD
+    return options
+
+
+class PooledSMTPBackend(SMTPBackend):
+    """SMTPBackend that remembers when it was last used"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.last_used = time.monotonic()
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def healthy(self) -> bool:
+        """Send a NOOP, False if the connection is lost"""
+        try:
+            code, _ = self._client.noop()
+        except Exception:
+            return False
+        return code == 250
+
+
+class SMTPPool:
+    """Pool of SMTP connections, shared by the threads of a process.
+
+    At most `size` idle connections are kept, `size=0` disables the pool.
+    Example:
+        with smtp_pool.connection() as backend:
+            message.send(to="mymail@fastapi.test", smtp=backend)
+    """
+
+    def __init__(
+        self,
+        options: Callable[[], Dict],
+        size: int,
+        idle_timeout: float = 60,
+        check_after: float = 5,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.options = options
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.timer = timer
+        self._idle: List[PooledSMTPBackend] = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._reused = 0
+        self._discarded = 0
+
+    def _pop_idle(self) -> Tuple[Optional[PooledSMTPBackend], List[PooledSMTPBackend]]:
+        """Most recently used connection, and the expired ones to close"""
+        with self._lock:
+            # a forked process must not share the sockets of its parent
+            if self._pid != os.getpid():
+                self._idle, self._pid = [], os.getpid()
+            # released connections are appended: the oldest come first
+            now = self.timer()
+            stale = 0
+            while stale < len(self._idle) and now - self._idle[stale].last_used > self.idle_timeout:
+                stale += 1
+            expired, self._idle = self._idle[:stale], self._idle[stale:]
+            self._discarded += len(expired)
+            return (self._idle.pop() if self._idle else None), expired
+
+    def _acquire(self) -> PooledSMTPBackend:
+        backend, expired = self._pop_idle()
+        for old in expired:
+            old.close()
+
+        if backend is not None and self.timer() - backend.last_used > self.check_after:
+            if not backend.healthy():
+                backend.close()
+                with self._lock:
+                    self._discarded += 1
+                backend = None
+
+        with self._lock:
+            if backend is None:
+                self._opened += 1
+            else:
+                self._reused += 1
+        return backend or PooledSMTPBackend(**self.options())
+
+    def _release(self, backend: PooledSMTPBackend, broken: bool) -> None:
+        backend.last_used = self.timer()
+        with self._lock:
+            if not broken and backend.connected and len(self._idle) < self.size:
+                self._idle.append(backend)
+                return
+        backend.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledSMTPBackend]:
+        """A connection for one or several messages, returned to the pool
+        afterwards unless the sending raised
+        """
+        backend = self._acquire()
+        broken = True
+        try:
+            yield backend
+            broken = False
+        finally:
+            self._release(backend, broken)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for backend in idle:
+            backend.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "opened": self._opened,
+                "reused": self._reused,
+                "discarded": self._discarded,
+            }
+
+
+smtp_pool = SMTPPool(
+    smtp_options,
+    size=config.SMTP_POOL_SIZE,
+    idle_timeout=config.SMTP_POOL_IDLE_TIMEOUT,
+    check_after=config.SMTP_POOL_CHECK_AFTER,
+)
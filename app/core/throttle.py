@@ -0,0 +1,112 @@
+"""Login throttling
+
+Failed logins are counted in sliding windows, per account and per client
+address, in the memory of each process. Once a limit is reached, new
+attempts are rejected before the password is verified, so that credential
+stuffing does not keep every core busy with bcrypt.
+
+Consecutive failures are also persisted in User.login_retry, which locks
+the account across processes and restarts (see User.authenticate).
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Hashable
+
+from cachetools import TTLCache
+
+from app.core import config
+from app.models.user import normalize_email
+
+
+class SlidingWindow:
+    """Count events per key over the last `period` seconds.
+
+    A limit of 0 disables the window. At most `maxsize` keys are tracked,
+    the least recently used are forgotten first.
+    Example:
+        window = SlidingWindow(limit=5, period=60)
+        window.hit("mymail@fastapi.test")
+        window.retry_after("mymail@fastapi.test")
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        period: float,
+        maxsize: int = 100000,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = limit
+        self.period = period
+        self.timer = timer
+        self._hits = TTLCache(maxsize=maxsize, ttl=period, timer=timer)
+        self._lock = threading.Lock()
+
+    def _events(self, key: Hashable) -> deque:
+        events = self._hits.get(key, deque())
+        start = self.timer() - self.period
+        while events and events[0] <= start:
+            events.popleft()
+        return events
+
+    def hit(self, key: Hashable) -> None:
+        if not self.limit:
+            return
+        with self._lock:
+            events = self._events(key)
+            events.append(self.timer())
+            # only the last `limit` events matter
+            while len(events) > self.limit:
+                events.popleft()
+            self._hits[key] = events
+
+    def count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._events(key))
+
+    def retry_after(self, key: Hashable) -> float:
+        """Seconds before a new event is allowed, 0 if it is allowed now"""
+        if not self.limit:
+            return 0
+        with self._lock:
+            events = self._events(key)
+            if len(events) < self.limit:
+                return 0
+            return events[-self.limit] + self.period - self.timer()
+
+    def reset(self, key: Hashable) -> None:
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+class LoginThrottle:
+    """Failed logins per account and per client.
+
+    Accounts are counted by normalized email, as they are looked up.
+    """
+
+    def __init__(self, account_limit: int, client_limit: int, period: float, **kwargs):
+        self.accounts = SlidingWindow(account_limit, period, **kwargs)
+        self.clients = SlidingWindow(client_limit, period, **kwargs)
+
+    def retry_after(self, email: str, client: str) -> float:
+        """Seconds before a new login is allowed, 0 if it is allowed now"""
+        return max(
+            self.accounts.retry_after(normalize_email(email)),
+            self.clients.retry_after(client),
+        )
+
+    def failure(self, email: str, client: str) -> None:
+        self.accounts.hit(normalize_email(email))
+        self.clients.hit(client)
+
+    def success(self, email: str) -> None:
+        self.accounts.reset(normalize_email(email))
+
+
+login_throttle = LoginThrottle(
+    account_limit=config.LOGIN_ACCOUNT_MAX_FAILURES,
+    client_limit=config.LOGIN_CLIENT_MAX_FAILURES,
+    period=config.LOGIN_THROTTLE_PERIOD,
+)
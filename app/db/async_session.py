@@ -0,0 +1,11 @@
+"""Async database access
+
+SQLAlchemy 1.3 has no asyncio support: async endpoints go through the
+`databases` package (aiosqlite locally and in tests, asyncpg on Postgres)
+with SQLAlchemy Core queries built from the model tables.
+"""
+from databases import Database
+
+from app.core import config
+
+database = Database(config.ASYNC_DATABASE_URI)
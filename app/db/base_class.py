@@ -1,16 +1,35 @@
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from sqlalchemy import and_, bindparam, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql.expression import Insert
+from sqlalchemy.ext import baked
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
+from sqlalchemy.orm import Query, Session, scoped_session
 
-from sqlalchemy_mixins import AllFeaturesMixin
+from sqlalchemy_mixins import AllFeaturesMixin, ModelNotFoundError
 
+from app.core import config
+from app.core.cache import count_cache
+from app.db.async_session import database
+from app.db.pagination import InvalidCursorError, paginate
 from app.db.session import SessionScope
 
 
+# compiled SQL of the lookups run on every request, see BaseModel.find_by
+bakery = baked.bakery()
+
+
 class ModelExistError(ValueError):
     pass
 
 
+def is_unique_violation(error: Exception, column: str) -> bool:
+    """True if the database error is a duplicate value in the unique column"""
+    message = str(error).lower()
+    return column in message and ("unique" in message or "duplicate" in message)
+
+
 @as_declarative()
 class Base(object):
     id: Any
@@ -24,12 +43,142 @@ class Base(object):
 
 class BaseModel(Base, AllFeaturesMixin):
     __abstract__ = True
+    # orders available to all_by_cursor, the columns must be a unique key
+    __cursor_orders__ = {"id": ("id",)}
+
+    @classmethod
+    def _projection(cls, columns: Optional[List[str]] = None, extra: Sequence[str] = ()) -> Query:
+        """Query the whole entities, or only the given columns as tuples.
+        The extra columns are added at the end of the tuples if missing.
+        """
+        if columns is None:
+            return cls.query
+        names = list(columns) + [name for name in extra if name not in columns]
+        return cls.session.query(*(getattr(cls, name) for name in names))
 
     @classmethod
-    def all_by_page(cls, page: int = 1, limit: int = 20, **kwargs) -> Dict:
+    def all_by_page(cls, page: int = 1, limit: int = 20, columns: Optional[List[str]] = None, **kwargs) -> Dict:
         start = (page - 1) * limit
         end = start + limit
-        return cls.query.slice(start, end).all()
+        return cls._projection(columns).order_by(cls.id).slice(start, end).all()
+
+    @classmethod
+    def all_by_cursor(
+        cls,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        order_by: str = "id",
+        columns: Optional[List[str]] = None,
+    ) -> Tuple[List, Optional[str], Optional[str]]:
+        """Return a page and the cursors of the next and previous pages.
+        With `columns`, the page is a list of tuples starting with these
+        columns instead of model instances.
+        Example:
+            users, next, prev = User.all_by_cursor(limit=50)
+            users, next, prev = User.all_by_cursor(next, limit=50)
+        """
+        if order_by not in cls.__cursor_orders__:
+            raise InvalidCursorError(f"Cannot order by '{order_by}'")
+        keys = cls.__cursor_orders__[order_by]
+        query = cls._projection(columns, extra=keys)
+        return paginate(query, order_by, [getattr(cls, name) for name in keys], cursor=cursor, limit=limit)
+
+    @classmethod
+    def count_all(cls) -> int:
+        """Return the number of rows, served from the count cache when possible.
+        With COUNT_APPROXIMATE, Postgres planner statistics are used instead
+        of COUNT(*).
+        Example:
+            User.count_all()
+        """
+        count = count_cache.get(cls.__tablename__)
+        if count is None:
+            count = cls._approximate_count() if config.COUNT_APPROXIMATE else None
+            if count is None:
+                count = cls.session.query(func.count()).select_from(cls.__table__).scalar()
+            count_cache.set(cls.__tablename__, count)
+        return count
+
+    @classmethod
+    def _approximate_count(cls) -> Optional[int]:
+        if cls.session.get_bind().dialect.name != "postgresql":
+            return None
+        count = cls.session.execute(  # pragma: no cover
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": cls.__table__.fullname},
+        ).scalar()
+        # tables that were never analyzed have no statistics
+        return count if count and count > 0 else None  # pragma: no cover
+
+    @classmethod
+    def create(cls, **kwargs):
+        instance = super().create(**kwargs)
+        count_cache.incr(cls.__tablename__)
+        return instance
+
+    def delete(self) -> None:
+        super().delete()
+        count_cache.incr(self.__tablename__, -1)
+
+    @classmethod
+    def _with_defaults(cls, data: Dict) -> Dict:
+        """Add the python defaults that the ORM would set to a Core insert,
+        SQL defaults are rendered by the compiler.
+        """
+        for column in cls.__table__.columns:
+            if column.default is not None and column.default.is_scalar:
+                data.setdefault(column.name, column.default.arg)
+        return data
+
+    @classmethod
+    def _multi_row_inserts(cls, rows: List[Dict], dialect: str) -> List[Insert]:
+        """Split the rows into multi-row INSERT statements"""
+        # every row needs the same columns
+        columns = {column for data in rows for column in data}
+        values = [{column: data.get(column) for column in columns} for data in rows]
+        # bound parameters per statement, old sqlite versions are limited to 999
+        size = max((999 if dialect == "sqlite" else 32767) // max(len(columns), 1), 1)
+        return [cls.__table__.insert().values(values[i:i + size]) for i in range(0, len(values), size)]
+
+    @classmethod
+    def upsert(cls, data: Dict, index_elements: List[str]) -> None:
+        """Insert a row, or update the given columns of the row that has the
+        same unique index_elements (INSERT ... ON CONFLICT DO UPDATE).
+        Column defaults are only used by the insert.
+        Example:
+            User.upsert({"email": "mymail@fastapi.test", "full_name": "Me"}, ["email"])
+        """
+        table = cls.__table__
+        # defaults only apply to a new row, an existing row keeps its values
+        given = set(data)
+        update = {k: table.c[k] for k in data if k not in index_elements}
+        update.update({c.name: c.onupdate.arg for c in table.columns if c.onupdate is not None})
+        data = cls._with_defaults(dict(data))
+
+        dialect = cls.session.get_bind().dialect
+        if dialect.name == "postgresql":  # pragma: no cover
+            statement = postgresql.insert(table).values(**data)
+            statement = statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={k: getattr(statement.excluded, k) if k in given else v for k, v in update.items()},
+            )
+            cls.session.execute(statement)
+            return
+
+        if dialect.name != "sqlite":
+            raise NotImplementedError(f"upsert is not supported on {dialect.name}")  # pragma: no cover
+
+        # SQLAlchemy 1.3 has no ON CONFLICT construct for sqlite (>= 3.24)
+        named = sqlite.dialect(paramstyle="named")
+        compiled = table.insert().values(**data).compile(dialect=named)
+        quote = named.identifier_preparer.quote
+        assignments = ", ".join(
+            f"{quote(k)} = excluded.{quote(k)}" if k in given else f"{quote(k)} = {v.compile(dialect=named)}"
+            for k, v in update.items()
+        )
+        conflict = ", ".join(quote(k) for k in index_elements)
+        action = f"DO UPDATE SET {assignments}" if assignments else "DO NOTHING"
+        cls.session.execute(text(f"{compiled} ON CONFLICT ({conflict}) {action}"), compiled.params)
 
     @classmethod
     def get(cls, **kwargs) -> Dict:
@@ -39,5 +188,72 @@ class BaseModel(Base, AllFeaturesMixin):
         """
         return cls.where(**kwargs).first()
 
+    @classmethod
+    def _current_session(cls) -> Session:
+        # baked queries need the session itself, not the scoped_session proxy
+        session = cls.session
+        return session() if isinstance(session, scoped_session) else session
+
+    @classmethod
+    def find_by(cls, column: str, value: Any):
+        """Same as get with a single equality filter, but the SQL is built and
+        compiled once per model and column (baked query).
+        Example:
+            User.find_by("email_normalized", "mymail@fastapi.test")
+        """
+        query = bakery(lambda session: session.query(cls), cls, column)
+        query += lambda q: q.filter(getattr(cls, column) == bindparam("value"))
+        return query(cls._current_session()).params(value=value).first()
+
+    @classmethod
+    def find_or_fail(cls, id_: Any):
+        """Return the instance with this primary key, from the identity map
+        when possible, the SQL of the load is compiled once (baked query).
+        Example:
+            User.find_or_fail(5)
+        """
+        instance = bakery(lambda session: session.query(cls), cls)(cls._current_session()).get(id_)
+        if instance is None:
+            raise ModelNotFoundError(f"{cls.__name__} with id '{id_}' was not found")
+        return instance
+
+    # -------------------------------------------------------------------------
+    # Async versions, they return dicts instead of model instances
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    async def async_all_by_page(cls, page: int = 1, limit: int = 20) -> List[Dict]:
+        """Async version of all_by_page.
+        Example:
+            await User.async_all_by_page(page=2)
+        """
+        start = (page - 1) * limit
+        table = cls.__table__
+        query = table.select().order_by(table.c.id).offset(max(start, 0)).limit(limit)
+        return [dict(row) for row in await database.fetch_all(query)]
+
+    @classmethod
+    async def async_get(cls, **kwargs) -> Optional[Dict]:
+        """Async version of get, only equality filters are supported.
+        Example:
+            await User.async_get(id=5)
+        """
+        table = cls.__table__
+        query = table.select().where(and_(*(table.c[k] == v for k, v in kwargs.items())))
+        row = await database.fetch_one(query.limit(1))
+        return dict(row) if row is not None else None
+
+    @classmethod
+    async def async_find_or_fail(cls, id: Any) -> Dict:
+        """Async version of find_or_fail.
+        Example:
+            await User.async_find_or_fail(5)
+        """
+        row = await cls.async_get(id=id)
+        if row is None:
+            raise ModelNotFoundError(f"{cls.__name__} with id '{id}' was not found")
+        return row
+
 
-BaseModel.set_session(SessionScope())
+# the models use the session of the current request, see session_scope
+BaseModel.set_session(SessionScope)
@@ -17,7 +17,7 @@ def init_db():
     # the tables un-commenting the next line
     # Base.metadata.create_all(bind=engine)
 
-    user = UserModel.get(email=config.FIRST_SUPERUSER)
+    user = UserModel.get_by_email(config.FIRST_SUPERUSER)
     if not user:
         user_in = UserCreate(
             email=config.FIRST_SUPERUSER,
@@ -0,0 +1,80 @@
+"""Keyset pagination
+
+Pages are read after (or before) the key of the last row seen instead of
+using OFFSET, so every page costs the same whatever its depth. The key is
+sent to the client as an opaque cursor.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, DateTime, tuple_
+from sqlalchemy.orm import Query
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(order: str, key: Sequence[Any], backward: bool = False) -> str:
+    """Return an opaque cursor from an order name and a row key"""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in key]
+    data = json.dumps([order, values, backward], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str, columns: Sequence[Column]) -> Tuple[List[Any], bool]:
+    """Return the key and direction stored in the cursor"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order, values, backward = json.loads(data)
+        key = [
+            datetime.fromisoformat(v) if isinstance(c.type, DateTime) else v
+            for c, v in zip(columns, values)
+        ]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise InvalidCursorError("Invalid cursor")
+    if cursor_order != order or len(values) != len(columns):
+        raise InvalidCursorError("The cursor does not match the requested order")
+    return key, bool(backward)
+
+
+def paginate(
+    query: Query,
+    order: str,
+    columns: Sequence[Column],
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> Tuple[List[Any], Optional[str], Optional[str]]:
+    """Return a page of the query, and the cursors of the next and previous pages.
+
+    `columns` must be a unique key, e.g. (time_creation, id).
+    """
+    key, backward = decode_cursor(cursor, order, columns) if cursor else (None, False)
+    keyset = tuple_(*columns)
+
+    if key is not None:
+        query = query.filter(keyset < tuple_(*key) if backward else keyset > tuple_(*key))
+    if backward:
+        query = query.order_by(*(c.desc() for c in columns))
+    else:
+        query = query.order_by(*columns)
+
+    # one more row tells if there is another page
+    rows = query.limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    def row_cursor(row, backward):
+        return encode_cursor(order, [getattr(row, c.key) for c in columns], backward)
+
+    next_cursor = prev_cursor = None
+    if rows and (more or backward):
+        next_cursor = row_cursor(rows[-1], False)
+    if rows and (more if backward else key is not None):
+        prev_cursor = row_cursor(rows[0], True)
+    return rows, next_cursor, prev_cursor
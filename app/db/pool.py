@@ -0,0 +1,86 @@
+"""Connection pool
+
+The queue pool records how long requests wait for a connection, so that the
+pool can be sized from the statistics (see /utils/db-pool/).
+"""
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that measures the checkout wait time"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait = 0.0
+        self._max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def recreate(self):
+        # the statistics are kept when the pool is disposed
+        pool = super().recreate()
+        pool._checkouts, pool._timeouts = self._checkouts, self._timeouts
+        pool._wait, pool._max_wait = self._wait, self._max_wait
+        return pool
+
+    def stats(self) -> Dict:
+        """Return the pool state and the average and max wait time (ms)"""
+        with self._stats_lock:
+            checkouts = self._checkouts or 1
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": max(self.overflow(), 0),
+                "max_overflow": self._max_overflow,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_avg_ms": self._wait / checkouts * 1000,
+                "wait_max_ms": self._max_wait * 1000,
+            }
+
+
+def ping_idle_connections(pool: Pool, interval: float) -> None:
+    """Ping connections idle for more than `interval` seconds on checkout.
+
+    Cheaper than pool_pre_ping, which pings on every checkout. A dead
+    connection is replaced by the pool.
+    """
+
+    @event.listens_for(pool, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        connection_record.info["checkin_time"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checkin_time = connection_record.info.get("checkin_time")
+        if checkin_time is None or time.monotonic() - checkin_time < interval:
+            return
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            # the pool retries the checkout with a new connection
+            raise exc.DisconnectionError()
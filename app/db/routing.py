@@ -0,0 +1,113 @@
+"""Read replicas
+
+Queries of GET and HEAD requests are sent to the replicas, in turn. Writes,
+queries that follow a flush and requests from a client that wrote a few
+seconds ago stay on the primary, so that clients read their own writes
+despite the replication lag.
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Hashable, List, Optional
+
+from cachetools import TTLCache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# set for the requests that can read from a replica
+replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+class ReplicaRouter:
+    """Round-robin over the replicas that are up.
+
+    A replica that fails to connect or is disconnected is skipped for
+    `retry_interval` seconds.
+    """
+
+    def __init__(self, engines: List[Engine], retry_interval: float = 30, timer: Callable[[], float] = time.monotonic):
+        self.engines = engines
+        self.retry_interval = retry_interval
+        self.timer = timer
+        self._down = {}
+        self._cycle = itertools.cycle(engines)
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, "handle_error", self._handle_error)
+
+    def _handle_error(self, context) -> None:
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
+
+    def mark_down(self, engine: Engine) -> None:
+        with self._lock:
+            self._down[engine] = self.timer() + self.retry_interval
+
+    def get(self) -> Optional[Engine]:
+        """Return the next replica that is up, None if there is none"""
+        with self._lock:
+            now = self.timer()
+            for _ in range(len(self.engines)):
+                engine = next(self._cycle)
+                if self._down.get(engine, 0) <= now:
+                    self._down.pop(engine, None)
+                    return engine
+        return None
+
+
+class PrimaryPins:
+    """Clients that wrote recently and must read from the primary"""
+
+    def __init__(self, duration: float, maxsize: int = 100000):
+        self.enabled = duration > 0
+        self._pins = TTLCache(maxsize=maxsize, ttl=max(duration, 1e-3))
+        self._lock = threading.Lock()
+
+    def pin(self, *keys: Hashable) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            for key in keys:
+                self._pins[key] = True
+
+    def pinned(self, *keys: Hashable) -> bool:
+        """True if any of the keys that identify a client is pinned"""
+        with self._lock:
+            return any(key in self._pins for key in keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.pinned(key)
+
+
+class RoutingSession(Session):
+    """Session that reads from a replica when replica_reads is set"""
+
+    def __init__(self, router: Optional[ReplicaRouter] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None):
+        primary = super().get_bind(mapper=mapper, clause=clause)
+        if not self.router or not replica_reads.get() or self._flushing or self.info.get("flushed"):
+            return primary
+        # one replica per transaction: the replicas do not lag the same
+        if "replica" not in self.info:
+            self.info["replica"] = self.router.get()
+        return self.info["replica"] or primary
+
+
+def _stay_on_primary(session, flush_context) -> None:
+    # the transaction wrote: the next queries must see the changes
+    session.info["flushed"] = True
+
+
+def _reset(session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop("flushed", None)
+        session.info.pop("replica", None)
+
+
+event.listen(RoutingSession, "after_flush", _stay_on_primary)
+event.listen(RoutingSession, "after_transaction_end", _reset)
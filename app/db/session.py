@@ -1,16 +1,83 @@
-from sqlalchemy import create_engine
+import threading
+from contextvars import ContextVar
+from typing import Hashable, Optional
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from app.core import config
+from app.db.pool import InstrumentedQueuePool, ping_idle_connections
+from app.db.routing import PrimaryPins, ReplicaRouter, RoutingSession
+from app.db.sqlite import apply_pragmas, sqlite_pragmas, use_savepoints
+from app.db.stats import instrument_engine
+
+
+def _pool_args(url: str) -> dict:
+    # a ping interval replaces the ping on every checkout
+    pre_ping = config.DB_POOL_PRE_PING and not config.DB_POOL_PING_INTERVAL
+    # sqlite does not use a queue pool and needs special parameters
+    if url.startswith('sqlite'):
+        return {"pool_pre_ping": pre_ping, "connect_args": {"check_same_thread": False}}
+    return {  # pragma: no cover
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": pre_ping,
+    }
+
 
-engine = create_engine(
-    config.SQLALCHEMY_DATABASE_URI,
-    pool_pre_ping=True,
-    connect_args=config.SQLALCHEMY_CONNECT_ARGS
+def create_pooled_engine(url: str):
+    engine = create_engine(url, **_pool_args(url))
+    if url.startswith('sqlite'):
+        apply_pragmas(engine, sqlite_pragmas())
+        use_savepoints(engine)
+    instrument_engine(engine)
+    if config.DB_POOL_PING_INTERVAL:
+        ping_idle_connections(engine.pool, config.DB_POOL_PING_INTERVAL)
+    return engine
+
+
+engine = create_pooled_engine(config.SQLALCHEMY_DATABASE_URI)
+
+# reads of GET and HEAD requests, see app.db.routing
+replica_router = ReplicaRouter(
+    [create_pooled_engine(url) for url in config.DATABASE_REPLICA_URLS],
+    retry_interval=config.DB_REPLICA_RETRY_INTERVAL,
 )
+primary_pins = PrimaryPins(config.DB_REPLICA_STICKY_SECONDS)
+
+# key of the session of the current request, set by db_session_middleware
+session_scope: ContextVar[Optional[Hashable]] = ContextVar("session_scope", default=None)
+
+
+def _current_scope() -> Hashable:
+    # the threadpool runs the endpoint with a copy of the request context,
+    # code outside of a request (scripts, tests) gets a session per thread
+    scope = session_scope.get()
+    return scope if scope is not None else threading.get_ident()
+
 
 SessionScope = scoped_session(
-    sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    sessionmaker(
+        class_=RoutingSession,
+        router=replica_router if replica_router.engines else None,
+        autocommit=False,
+        autoflush=False,
+        bind=engine,
+    ),
+    scopefunc=_current_scope,
 )
+
+
+@event.listens_for(SessionScope, "after_begin")
+def _mark_session_in_use(session, transaction, connection):
+    session.info["in_use"] = True
+
+
+def session_in_use() -> bool:
+    """True when the current session started a transaction in the database"""
+    return SessionScope.registry.has() and SessionScope().info.get("in_use", False)
 # SessionScope = SessionScoping()
 # SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,87 @@
+"""SQLite tuning
+
+The default rollback journal with a full fsync serializes readers and
+writers and makes concurrent requests fail with "database is locked". The
+pragmas are applied on every new connection since most of them only last
+for the connection (journal_mode=WAL is persisted in the database file).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import config
+
+Pragma = Union[str, int]
+
+# set for the requests that write by db_session_middleware, see use_savepoints
+write_intent: ContextVar[bool] = ContextVar("write_intent", default=False)
+
+
+def sqlite_pragmas() -> Dict[str, Pragma]:
+    """Return the configured pragmas, an empty value keeps the default"""
+    pragmas = {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+        "temp_store": config.SQLITE_TEMP_STORE,
+    }
+    return {name: value for name, value in pragmas.items() if value not in ("", None)}
+
+
+def apply_pragmas(engine: Engine, pragmas: Dict[str, Pragma]) -> None:
+    """Run the pragmas on each connection opened by the engine.
+    Example:
+        apply_pragmas(engine, {"journal_mode": "WAL", "busy_timeout": 5000})
+    """
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def use_savepoints(engine: Engine) -> None:
+    """Let SQLAlchemy begin the transactions instead of pysqlite.
+
+    pysqlite only emits BEGIN before a write, so a SAVEPOINT issued first
+    opens the transaction itself and its RELEASE commits everything (see the
+    pysqlite "Serializable isolation / Savepoints" notes of SQLAlchemy).
+
+    A transaction that reads first and writes later can not wait for the
+    write lock in WAL mode: it fails with "database is locked" at once. The
+    transactions begun in a `writing()` block take the lock with BEGIN
+    IMMEDIATE, waiting for it up to the busy timeout.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _disable_implicit_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.execute("BEGIN IMMEDIATE" if write_intent.get() else "BEGIN")
+
+
+@contextmanager
+def writing() -> Iterator[None]:
+    """The sqlite transactions begun in this block will write.
+    Example:
+        with writing(), engine.begin() as connection:
+            ...
+    """
+    token = write_intent.set(True)
+    try:
+        yield
+    finally:
+        write_intent.reset(token)
@@ -0,0 +1,67 @@
+"""Per-request SQL statistics
+
+The statements run by the engines are counted in the statistics of the
+current request, held in a context variable so that the threadpool running
+the endpoint records in the same object. The totals are sent in the
+Server-Timing header and in the logs (see app.main).
+
+The async endpoints use the `databases` package and are not counted.
+"""
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """Statements run during one request.
+    Example:
+        stats = QueryStats()
+        stats.record("SELECT 1", 0.002)
+        stats.repeated(threshold=5)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements run at least `threshold` times, likely N+1 queries"""
+        if not threshold:
+            return []
+        with self._lock:
+            return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        """Value of the Server-Timing header"""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+# statistics of the current request, None outside of a request
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record the statements of the engine in the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        stats = query_stats.get()
+        if stats is not None:
+            stats.record(statement, time.perf_counter() - context._query_start)
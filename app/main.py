@@ -1,14 +1,25 @@
 """Main entry point"""
+import logging
+
 import sentry_sdk
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sentry_asgi import SentryMiddleware
 from sentry_sdk.integrations.celery import CeleryIntegration
 from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 
 from app.api.api_v1.api import api_router
 from app.core import config
-from app.db.session import SessionScope
+from app.core.outbox import outbox_worker
+from app.core.pwned import get_pwned_filter, get_pwned_index
+from app.core.security import PasswordHasherBusyError, hasher
+from app.core.smtp import smtp_pool
+from app.db.async_session import database
+from app.db.routing import replica_reads
+from app.db.session import SessionScope, primary_pins, session_in_use, session_scope
+from app.db.sqlite import write_intent
+from app.db.stats import QueryStats, query_stats
 
 # Sentry configuration, logging service
 if config.SENTRY_DSN:
@@ -48,15 +59,120 @@ app.add_middleware(SentryMiddleware)
 app.include_router(api_router, prefix=config.API_V1_STR)
 
 
+# requests that must not change anything
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
     response = Response("Internal server error", status_code=500)
 
+    # CORS preflight requests never reach an endpoint
+    if request.method == "OPTIONS":
+        return await call_next(request)
+
+    # clients read from the primary for a while after a write, known by their
+    # address and their token: a write without a token pins the address
+    address = request.client.host if request.client else None
+    clients = [key for key in (address, request.headers.get("authorization")) if key]
+    token = replica_reads.set(request.method in READ_ONLY_METHODS and not primary_pins.pinned(*clients))
+    # sqlite takes the write lock when the transaction begins
+    writes = write_intent.set(request.method not in READ_ONLY_METHODS)
+
+    # the session is created on first use, see session_in_use, and is only
+    # shared by the code of this request
+    scope = session_scope.set(object())
+    request.state.db = SessionScope
     try:
-        request.state.db = SessionScope
         response = await call_next(request)
-        request.state.db.commit()
+        if getattr(request.state, "no_db", False) or not session_in_use():
+            return response
+        if request.method in READ_ONLY_METHODS:
+            # nothing to flush, a rollback is cheaper than a commit
+            request.state.db.rollback()
+        else:
+            request.state.db.commit()
+            primary_pins.pin(*clients)
     finally:
+        replica_reads.reset(token)
+        write_intent.reset(writes)
         # clean exit in case of error
-        request.state.db.close()
+        if SessionScope.registry.has():
+            request.state.db.remove()
+        session_scope.reset(scope)
+    return response
+
+
+# added last to wrap the commit of db_session_middleware
+@app.middleware("http")
+async def sql_stats_middleware(request: Request, call_next):
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        query_stats.reset(token)
+
+    path = request.url.path
+    logging.info(
+        f"{request.method} {path}: {stats.count} queries in {stats.duration * 1000:.1f}ms",
+        extra={"db_queries": stats.count, "db_time_ms": stats.duration * 1000},
+    )
+    for statement, count in stats.repeated(config.SQL_REPEATED_THRESHOLD):
+        logging.warning(f"{request.method} {path}: likely N+1 query, run {count} times: {statement}")
+    if config.SQL_SERVER_TIMING:
+        response.headers.append("Server-Timing", stats.server_timing())
     return response
+
+
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusyError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "The server is busy, please try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.on_event("startup")
+def map_pwned_passwords():
+    """Map the pwned passwords database before the first sign-up"""
+    if not config.PASSWORD_PWNED_CHECK:
+        return
+    try:
+        get_pwned_index(config.PASSWORD_DB_PATH)
+        if config.PASSWORD_FILTER_PATH:
+            get_pwned_filter(config.PASSWORD_FILTER_PATH)
+    except (OSError, ValueError) as e:
+        logging.error(f"cannot load the pwned passwords database: {e}")
+
+
+@app.on_event("startup")
+async def connect_database():
+    await database.connect()
+
+
+@app.on_event("shutdown")
+async def disconnect_database():
+    await database.disconnect()
+
+
+@app.on_event("startup")
+def start_outbox_worker():
+    if config.EMAILS_OUTBOX and config.EMAILS_OUTBOX_WORKER:
+        outbox_worker.start()
+
+
+@app.on_event("shutdown")
+def stop_outbox_worker():
+    outbox_worker.stop(timeout=config.EMAILS_OUTBOX_POLL_INTERVAL)
+
+
+@app.on_event("shutdown")
+def close_smtp_connections():
+    smtp_pool.close()
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    hasher.shutdown()
@@ -0,0 +1,110 @@
+"""
+Emails waiting to be sent
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text, and_, func, select
+
+from app.db.base_class import BaseModel
+from app.db.session import engine
+from app.db.sqlite import writing
+
+
+class EmailOutbox(BaseModel):
+    """Rendered emails, written in the transaction of the request and sent by
+    the outbox worker (see app.core.outbox). Rows are deleted once sent, the
+    ones that failed too many times are kept with failed set.
+    """
+    __repr_attrs__ = ['id', 'email_to', 'attempts']
+    __table_args__ = (
+        Index("ix_emailoutbox_failed_next_attempt", "failed", "next_attempt"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    email_to = Column(String, nullable=False)
+    subject = Column(String)
+    html = Column(Text)
+
+    # delivery, times are UTC
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String)
+    failed = Column(Boolean(), default=False, nullable=False)
+    time_creation = Column(DateTime(timezone=True), default=func.now())
+
+    @classmethod
+    def enqueue(cls, email_to: str, subject: str, html: str) -> EmailOutbox:
+        """Add an email to the session of the request, it is sent once the
+        request is committed.
+        Example:
+            EmailOutbox.enqueue("mymail@fastapi.test", "Hello", "<p>Hello</p>")
+        """
+        return cls.create(email_to=email_to, subject=subject, html=html)
+
+    # -------------------------------------------------------------------------
+    # Worker side, each method runs in its own transaction
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def claim(cls, limit: int, lease: int) -> List[Dict]:
+        """Return up to `limit` emails due for delivery, hidden from the other
+        workers for `lease` seconds in case this one dies while sending.
+        """
+        table = cls.__table__
+        now = datetime.utcnow()
+        until = now + timedelta(seconds=lease)
+        due = and_(table.c.failed.is_(False), table.c.next_attempt <= now)
+        with writing(), engine.begin() as conn:
+            ids = [row.id for row in conn.execute(
+                select([table.c.id]).where(due).order_by(table.c.next_attempt)
+                .limit(limit).with_for_update(skip_locked=True)
+            )]
+            if not ids:
+                return []
+            # the condition on next_attempt drops the rows claimed concurrently
+            conn.execute(
+                table.update().where(and_(table.c.id.in_(ids), due))
+                .values(next_attempt=until, attempts=table.c.attempts + 1)
+            )
+            rows = conn.execute(
+                table.select().where(and_(table.c.id.in_(ids), table.c.next_attempt == until))
+            )
+            return [dict(row) for row in rows]
+
+    @classmethod
+    def delivered(cls, ids: List[int]) -> None:
+        if ids:
+            with engine.begin() as conn:
+                conn.execute(cls.__table__.delete().where(cls.__table__.c.id.in_(ids)))
+
+    @classmethod
+    def retry(cls, id: int, error: str, delay: float, failed: bool = False) -> None:
+        """Schedule a new attempt in `delay` seconds, or give up"""
+        table = cls.__table__
+        with engine.begin() as conn:
+            conn.execute(table.update().where(table.c.id == id).values(
+                last_error=error[:1000],
+                next_attempt=datetime.utcnow() + timedelta(seconds=delay),
+                failed=failed,
+            ))
+
+    @classmethod
+    def depth(cls) -> Dict:
+        """Return the number of pending and failed emails and the age of the
+        oldest pending one, in seconds
+        """
+        table = cls.__table__
+        query = select([
+            table.c.failed, func.count(table.c.id), func.min(table.c.time_creation)
+        ]).group_by(table.c.failed)
+        with engine.connect() as conn:
+            groups = {failed: (count, oldest) for failed, count, oldest in conn.execute(query)}
+        pending, oldest = groups.get(False, (0, None))
+        age = 0.0
+        if oldest is not None:
+            now = datetime.now(oldest.tzinfo) if oldest.tzinfo else datetime.utcnow()
+            age = max((now - oldest).total_seconds(), 0.0)
+        return {"pending": pending, "failed": groups.get(True, (0, None))[0], "oldest_pending_s": age}
@@ -3,28 +3,82 @@ Generic User model
 """
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
-from passlib.context import CryptContext
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached, validates
 from sqlalchemy.sql import func
 
-from app.db.base_class import BaseModel, ModelExistError
-from app.schemas.user import UserBaseInDB, UserCreate, UserUpdate
+from app.core import config
+from app.core.cache import count_cache, user_cache
+from app.core.security import hasher
+from app.db.async_session import database
+from app.db.base_class import BaseModel, ModelExistError, is_unique_violation
+from app.db.session import SessionScope
+from app.schemas.user import UserBaseInDB, UserCreate, UserCreateFull, UserUpdate
 from app.utils import random_n_words
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@event.listens_for(SessionScope, "after_commit")
+def _invalidate_committed_users(session) -> None:
+    # see User._invalidate_cache
+    for id in session.info.pop("invalidated_users", ()):
+        user_cache.invalidate(id)
+
+
+@event.listens_for(SessionScope, "after_rollback")
+def _forget_invalidated_users(session) -> None:
+    session.info.pop("invalidated_users", None)
+
+
+def _exist_error(line: int) -> Dict:
+    return {
+        "line": line,
+        "loc": ["email"],
+        "msg": "The user with this email already exists",
+        "type": "value_error.exists",
+    }
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Emails are unique and looked up whatever their case"""
+    return email.strip().lower() if email is not None else None
+
+
+def _normalized_email_default(context) -> Optional[str]:
+    # used by Core inserts, the ORM sets it in User._normalize_email
+    return normalize_email(context.get_current_parameters().get("email"))
+
+
+async def _insert_new_email(query) -> bool:
+    """Run the insert, return False if the email already exists"""
+    try:
+        await database.execute(query)
+    except Exception as e:
+        if not is_unique_violation(e, "email"):
+            raise
+        return False
+    return True
 
 
 class User(BaseModel):
     __repr_attrs__ = ['id', 'email', 'full_name']
+    # attributes kept in the user cache, the others are loaded on access
+    __snapshot_attrs__ = ['id', 'email', 'full_name', 'is_active', 'is_superuser', 'password_set']
+    __cursor_orders__ = {"id": ("id",), "time_creation": ("time_creation", "id")}
+    __table_args__ = (
+        Index("ix_user_time_creation_id", "time_creation", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
     # user defined
     full_name = Column(String, index=True)
     email = Column(String, unique=True, index=True)
+    # lookup key of the email, see get_by_email
+    email_normalized = Column(String, unique=True, index=True, default=_normalized_email_default)
 
     # admin only
     is_active = Column(Boolean(), default=True)
@@ -32,23 +86,54 @@ class User(BaseModel):
 
     # generated
     login_retry = Column(Integer)
+    last_failed_login = Column(DateTime(timezone=True), default=None)
     hashed_password = Column(String)
     password_set = Column(Boolean(), default=False)
     password_expire = Column(DateTime(timezone=True), default=None)
     time_creation = Column(DateTime(timezone=True), default=func.now())
     time_updated = Column(DateTime(timezone=True), onupdate=func.now())
 
+    @staticmethod
+    def _password_data(hash: str) -> Dict:
+        return {
+            "hashed_password": hash,
+            "password_set": True,
+            "password_expire": None,
+            "login_retry": 0,
+        }
+
     @classmethod
     def _set_hash(cls, data):
         if 'password' in data and data["password"]:
-            hash = pwd_context.hash(data["password"])
+            hash = hasher.hash(data["password"])
             del data["password"]
-            data["hashed_password"] = hash
-            data["password_set"] = True
-            data["password_expire"] = None
-            data["login_retry"] = 0
+            data.update(cls._password_data(hash))
         return data
 
+    @validates("email")
+    def _normalize_email(self, key: str, email: Optional[str]) -> Optional[str]:
+        self.email_normalized = normalize_email(email)
+        return email
+
+    @classmethod
+    def _with_defaults(cls, data: Dict) -> Dict:
+        if "email" in data:
+            data.setdefault("email_normalized", normalize_email(data["email"]))
+        return super()._with_defaults(data)
+
+    @classmethod
+    def get_by_email(cls, email: str) -> Optional[User]:
+        """Return the user with this email, whatever its case.
+        Example:
+            User.get_by_email("MyMail@fastapi.test")
+        """
+        return cls.find_by("email_normalized", normalize_email(email))
+
+    @classmethod
+    async def async_get_by_email(cls, email: str) -> Optional[Dict]:
+        """Async version of get_by_email"""
+        return await cls.async_get(email_normalized=normalize_email(email))
+
     @classmethod
     def _import(cls, user: UserBaseInDB):
         data = user.dict(exclude_unset=True)
@@ -58,14 +143,53 @@ class User(BaseModel):
     @classmethod
     def create(cls, user: UserCreate) -> User:
         """Create a new user and return the new instance.
+        Raise ModelExistError if the email is already used.
         Example:
             user = User.create(obj)
         """
-        if cls.get(email=user.email):
+        data = cls._import(user)
+        # the unique email index is checked by the insert itself, in a
+        # savepoint so that a duplicate leaves the rest of the transaction
+        try:
+            with cls.session.begin_nested():
+                return super().create(**data)
+        except IntegrityError as e:
+            if not is_unique_violation(e, "email"):
+                raise
             raise ModelExistError
 
+    @classmethod
+    def create_or_update(cls, user: UserCreate) -> User:
+        """Create the user, or update the user that has the same email.
+        Example:
+            user = User.create_or_update(obj)
+        """
         data = cls._import(user)
-        return super().create(**data)
+        cls.upsert(data, ["email_normalized"])
+
+        # the row may be new or updated, loaded with the values in database
+        email = normalize_email(data["email"])
+        user = cls.query.populate_existing().filter_by(email_normalized=email).one()
+        user._invalidate_cache()
+        count_cache.invalidate(cls.__tablename__)
+        return user
+
+    @classmethod
+    def find_cached(cls, id: int) -> User:
+        """Same as find_or_fail, but served from the user cache when possible.
+        Example:
+            user = User.find_cached(5)
+        """
+        snapshot = user_cache.get(id)
+        if snapshot is None:
+            user = cls.find_or_fail(id)
+            user_cache.set(id, {attr: getattr(user, attr) for attr in cls.__snapshot_attrs__})
+            return user
+
+        # attach the snapshot to the session without loading it again
+        user = cls(**snapshot)
+        make_transient_to_detached(user)
+        return cls.session.merge(user, load=False)
 
     @classmethod
     def authenticate(cls, email: str, password: str) -> Optional[User]:
@@ -76,20 +200,29 @@ class User(BaseModel):
         """
         # note that we get the user and don't make a direct search in the
         # database to avoid leaking informations in logs
-        user = cls.get(email=email)
-        if user and user.verify_password(password):
-            user.login_retry = 0
-            # temporary code cannot be re-use
-            if not user.password_set:
-                user.hashed_password = None
+        user = cls.get_by_email(email)
+        if not user:
+            return None
+
+        # too many failures: rejected without paying for bcrypt
+        if user.is_locked():
+            return None
+
+        if user.verify_password(password):
+            # most logins change nothing: no UPDATE, no row lock
+            for key, value in user._login_changes().items():
+                setattr(user, key, value)
             return user
+
+        for key, value in user._failed_login().items():
+            setattr(user, key, value)
         return None
 
     # TODO: handle errors
     # TODO: move duration to configuration
     @classmethod
     def generate_password(cls, email: str) -> str:
-        user = cls.get(email=email)
+        user = cls.get_by_email(email)
 
         if not user:
             return None
@@ -100,7 +233,7 @@ class User(BaseModel):
         user.login_retry = 0
         user.password_expire = datetime.now() + timedelta(hours=1)
         password = random_n_words()
-        user.hashed_password = pwd_context.hash(password)
+        user.hashed_password = hasher.hash(password)
         return password
 
     def update(self, user: UserUpdate) -> User:
@@ -110,8 +243,59 @@ class User(BaseModel):
         """
 
         data = self._import(user)
+        self._invalidate_cache()
         return super().update(**data)
 
+    def delete(self) -> None:
+        """Delete the user
+        Example:
+            user.delete()
+        """
+        self._invalidate_cache()
+        return super().delete()
+
+    def _invalidate_cache(self) -> None:
+        # now for this session, and again after the commit: until then other
+        # requests read the old row and may cache it again
+        user_cache.invalidate(self.id)
+        self.session.info.setdefault("invalidated_users", set()).add(self.id)
+
+    def _login_changes(self) -> Dict:
+        """Return the columns that a successful login must change"""
+        data = {}
+        if self.login_retry:
+            data["login_retry"] = 0
+        # temporary code cannot be re-use
+        if not self.password_set and self.hashed_password is not None:
+            data["hashed_password"] = None
+        return data
+
+    def _failed_login(self) -> Dict:
+        """Return the columns that a failed login must change"""
+        # failures are counted again once the lock has expired
+        retries = self.login_retry or 0
+        if config.LOGIN_MAX_RETRY and retries >= config.LOGIN_MAX_RETRY:
+            retries = 0
+        return {"login_retry": retries + 1, "last_failed_login": datetime.now(timezone.utc)}
+
+    def is_locked(self) -> bool:
+        """Check if too many consecutive logins failed recently
+        Example:
+            if user.is_locked():
+                print('Try again later')
+        """
+        if not config.LOGIN_MAX_RETRY or (self.login_retry or 0) < config.LOGIN_MAX_RETRY:
+            return False
+
+        last_failure = self.last_failed_login
+        if last_failure is None:
+            return True
+        if last_failure.tzinfo is None:
+            now = datetime.utcnow()
+        else:
+            now = datetime.now(timezone.utc)
+        return now - last_failure < timedelta(seconds=config.LOGIN_LOCK_DURATION)
+
     # TODO: handle errors
     def verify_password(self, password: str) -> bool:
         """Check that the password match the user password
@@ -119,6 +303,9 @@ class User(BaseModel):
             if not user.verify_password(wrong_password):
                 print('Wrong password')
         """
+        return self._password_usable() and hasher.verify(password, self.hashed_password)
+
+    def _password_usable(self) -> bool:
         # password was never defined or generated
         if not self.hashed_password:
             return False
@@ -127,4 +314,128 @@ class User(BaseModel):
         if self.password_expire and self.password_expire < datetime.now():
             return False
 
-        return pwd_context.verify(password, self.hashed_password)
+        return True
+
+    # -------------------------------------------------------------------------
+    # Async versions, they return dicts instead of model instances
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    async def async_create(cls, user: UserCreate) -> Dict:
+        """Async version of create.
+        Example:
+            user = await User.async_create(obj)
+        """
+        data = user.dict(exclude_unset=True)
+        password = data.pop("password", None)
+        if password:
+            data.update(cls._password_data(await hasher.hash_async(password)))
+
+        table = cls.__table__
+        query = table.insert().values(**cls._with_defaults(data))
+        if database.url.dialect.startswith("postgres"):
+            query = query.returning(table.c.id)
+        # driver errors are not wrapped by SQLAlchemy here
+        try:
+            id = await database.execute(query)
+        except Exception as e:
+            if not is_unique_violation(e, "email"):
+                raise
+            raise ModelExistError
+        user = await cls.async_find_or_fail(id)
+        count_cache.incr(cls.__tablename__)
+        return user
+
+    @classmethod
+    async def async_import(cls, users: List[Tuple[int, UserCreateFull]]) -> Tuple[int, List[Dict]]:
+        """Insert a batch of validated users in one transaction.
+        Return the number of users created and the errors with their line.
+        Example:
+            created, errors = await User.async_import([(1, obj), (2, obj)])
+        """
+        table = cls.__table__
+        emails = [normalize_email(user.email) for _, user in users]
+        query = table.select().with_only_columns([table.c.email_normalized]).where(table.c.email_normalized.in_(emails))
+        existing = {row["email_normalized"] for row in await database.fetch_all(query)}
+
+        rows, errors = [], []
+        for (line, user), email in zip(users, emails):
+            if email in existing:
+                errors.append(_exist_error(line))
+                continue
+            existing.add(email)
+            rows.append((line, user.dict(exclude_unset=True)))
+
+        # passwords are hashed in parallel
+        passwords = [data.pop("password", None) for _, data in rows]
+        hashes = iter(await hasher.hash_many_async([p for p in passwords if p]))
+        for (_, data), password in zip(rows, passwords):
+            if password:
+                data.update(cls._password_data(next(hashes)))
+            cls._with_defaults(data)
+
+        created, duplicates = await cls._async_insert_many(rows)
+        count_cache.invalidate(cls.__tablename__)
+        return created, errors + [_exist_error(line) for line in duplicates]
+
+    @classmethod
+    async def _async_insert_many(cls, rows: List[Tuple[int, Dict]]) -> Tuple[int, List[int]]:
+        """Insert the rows, return the number inserted and the lines of the
+        emails that already exist.
+        """
+        table = cls.__table__
+        try:
+            async with database.transaction():
+                for query in cls._multi_row_inserts([data for _, data in rows], database.url.dialect):
+                    await database.execute(query)
+            return len(rows), []
+        except Exception as e:
+            if not is_unique_violation(e, "email"):
+                raise
+
+        # created concurrently, the rows are inserted one by one instead
+        duplicates = [line for line, data in rows if not await _insert_new_email(table.insert().values(**data))]
+        return len(rows) - len(duplicates), duplicates
+
+    @classmethod
+    async def async_generate_password(cls, email: str) -> Optional[str]:
+        """Async version of generate_password"""
+        user = await cls.async_get_by_email(email)
+
+        if not user or user["password_set"]:
+            return None
+
+        password = random_n_words()
+        table = cls.__table__
+        await database.execute(table.update().where(table.c.id == user["id"]).values(
+            login_retry=0,
+            password_expire=datetime.now() + timedelta(hours=1),
+            hashed_password=await hasher.hash_async(password),
+        ))
+        return password
+
+    @classmethod
+    async def async_authenticate(cls, email: str, password: str) -> Optional[Dict]:
+        """Async version of authenticate.
+        Example:
+            await User.async_authenticate("mymail@fastapi.test", "greatpassword")
+        """
+        row = await cls.async_get_by_email(email)
+        if not row:
+            return None
+
+        # transient instance, never attached to a session
+        user = cls(**row)
+        if user.is_locked():
+            return None
+
+        table = cls.__table__
+        if user._password_usable() and await hasher.verify_async(password, user.hashed_password):
+            data = user._login_changes()
+            if data:
+                await database.execute(table.update().where(table.c.id == user.id).values(**data))
+            return {**row, **data}
+
+        data = user._failed_login()
+        await database.execute(table.update().where(table.c.id == user.id).values(**data))
+        return None
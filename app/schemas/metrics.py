@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+
+
+class PasswordHasherStats(BaseModel):
+    workers: int
+    max_queue: int
+    pending: int
+    completed: int
+    rejected: int
+    errors: int
+    queue_wait_avg_ms: float
+    hash_time_avg_ms: float
+
+
+class DbPoolStats(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    timeouts: int
+    wait_avg_ms: float
+    wait_max_ms: float
+
+
+class EmailOutboxStats(BaseModel):
+    pending: int
+    failed: int
+    oldest_pending_s: float
+    sent: int
+    retried: int
+    given_up: int
+    running: bool
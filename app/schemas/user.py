@@ -3,7 +3,7 @@ import re
 from datetime import datetime
 
 from pydantic import BaseModel, EmailStr, validator
-from typing import Optional
+from typing import Any, Dict, List, Optional
 # import re
 
 # TODO: migrate to a pip package
@@ -101,3 +101,12 @@ class UserInDB(UserBaseInDB):
     login_retry: int
     password_set: bool
     password_expire: datetime
+
+
+# Progress of an import, streamed after each batch
+class UserImportProgress(BaseModel):
+    processed: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = []
+    done: bool = False
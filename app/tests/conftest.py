@@ -30,10 +30,12 @@ import app.tests.data.samples as samples
 from app.api.utils.security import create_token
 from app.core import config
 from app.core.jwt import create_access_token
+from app.core.security import pwd_context
 from app.db.base_class import Base
 from app.db.session import SessionScope, engine
 from app.main import app
-from app.models.user import User, pwd_context
+from app.models.email_outbox import EmailOutbox
+from app.models.user import User
 from app.tests.utils.utils import tweak_config
 
 
@@ -94,11 +96,19 @@ def empty_session() -> Generator:
     def mock_commit():
         pass
     SessionScope.commit = mock_commit
+    # without commits, the requests of a test only see the changes of the
+    # test through its session: they all share one (see test_session_scope)
+    SessionScope.registry.scopefunc = lambda: "tests"
 
     yield SessionScope
 
     if (file):
+        engine.dispose()
         os.remove(file)
+        # write-ahead log and shared memory of the WAL journal mode
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(file + suffix):
+                os.remove(file + suffix)
 
 
 @given("I have a test database ready", scope="session")
@@ -136,6 +146,18 @@ def empty_db(empty_session: scoped_session) -> Generator:
     s.close()
 
 
+@given("There are emails in the outbox", scope="function")
+def outbox(db) -> Generator:
+    """Emails committed in the outbox, removed after the test"""
+    emails = [
+        {"email_to": f"outbox{i}@fastapi.test", "subject": "Hello", "html": f"<p>{i}</p>"}
+        for i in range(3)
+    ]
+    engine.execute(EmailOutbox.__table__.insert(), emails)
+    yield emails
+    engine.execute(EmailOutbox.__table__.delete())
+
+
 @given("I have test data", scope="session")
 def sample_data() -> Dict:
     """"Test data so that test are predictibles"""
@@ -470,6 +492,73 @@ def check_response_status(
         f"Expected status code {code} but got {response.status_code}"
 
 
+@then("I should be active")
+@then("It should be active")
+def check_active(
+    response: Response,
+) -> None:
+    """Ensure that the returned user is active"""
+    r = response.json()
+    assert "is_active" in r
+    assert r["is_active"]
+
+
+@then("I should be inactive")
+@then("It should be inactive")
+def check_inactive(
+    response: Response,
+) -> None:
+    """Ensure that the returned user is active"""
+    r = response.json()
+    assert "is_active" in r
+    assert not r["is_active"]
+
+
+@then("The response should only contain the error")
+def check_empty_error_response(
+    response: Response,
+) -> None:
+    """Ensure that error response do not leak informations"""
+    r = response.json()
+    assert "detail" in r
+    assert len(r) == 1
+
+
+@then(parsers.re('The response error type should be "(?P<error>.+)"'))
+def check_error_type(
+    response: Response,
+    error: str,
+) -> None:
+    """Ensure that the response return the proper error types"""
+    r = response.json()
+    assert r["detail"][0]["type"]
+    assert r["detail"][0]["type"] == error
+
+
+@then("The list should not contain passwords")
+def check_list_user_passwords(
+    response: Response
+) -> None:
+    """Ensure that the user list return matches the test base"""
+    r = response.json()
+    for user in r:
+        assert "password" not in user, "password is present!"
+        assert "hashed_password" not in user, "hashed password is present!"
+
+
+@then(parsers.re(r'The following user fields should match: "(?P<listing>.+)"'))
+def field_matching(
+    response: Response,
+    data: Dict[str, str],
+    listing: str
+) -> None:
+    """Check that the given response fields match the current user"""
+    r = response.json()
+    for field in [f.strip() for f in listing.split(',')]:
+        assert field in r
+        assert r[field] == data[field]
+
+
 @then("I should receive an email")
 @then("The user should receive an email")
 def check_get_email(
@@ -0,0 +1,75 @@
+import pytest  # noqa
+from datetime import datetime, timedelta
+from typing import Dict, List
+from unittest import mock
+
+from app.core.outbox import OutboxWorker, backoff_delay
+from app.db.session import engine
+from app.models.email_outbox import EmailOutbox
+
+pytestmark = pytest.mark.functional
+
+table = EmailOutbox.__table__
+
+
+class FailingBackend:
+    def __init__(self):
+        self.sendmail = mock.Mock(side_effect=OSError("connection refused"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def test_drain_by_batches(outbox: List[Dict], smtp_server):
+    worker = OutboxWorker(batch_size=2, poll_interval=0)
+    assert worker.drain() == 2
+    assert worker.drain() == 1
+    assert worker.drain() == 0
+    smtp_server.assert_count(3)
+    assert EmailOutbox.depth()["pending"] == 0
+    assert worker.stats()["sent"] == 3
+
+
+def test_failures_are_retried_later(outbox: List[Dict]):
+    """A failed email should wait for the backoff, then be given up"""
+    worker = OutboxWorker(batch_size=10, poll_interval=0, max_attempts=2, backoff=60,
+                          backend_factory=FailingBackend)
+    assert worker.drain() == 3
+    rows = engine.execute(table.select()).fetchall()
+    assert all(row.attempts == 1 and not row.failed for row in rows)
+    assert all(row.next_attempt > datetime.utcnow() + timedelta(seconds=50) for row in rows)
+    assert "connection refused" in rows[0].last_error
+    assert worker.drain() == 0
+
+    engine.execute(table.update().values(next_attempt=datetime.utcnow()))
+    assert worker.drain() == 3
+    assert EmailOutbox.depth()["failed"] == 3
+    assert worker.stats()["retried"] == 3
+    assert worker.stats()["given_up"] == 3
+
+
+def test_claimed_emails_are_hidden(outbox: List[Dict]):
+    """Another worker should not send an email claimed by a worker"""
+    assert len(EmailOutbox.claim(limit=2, lease=60)) == 2
+    assert [e["email_to"] for e in EmailOutbox.claim(limit=10, lease=60)] == [outbox[2]["email_to"]]
+    assert EmailOutbox.claim(limit=10, lease=60) == []
+
+
+def test_worker_thread(outbox: List[Dict], smtp_server):
+    worker = OutboxWorker(batch_size=10, poll_interval=0.01)
+    worker.start()
+    try:
+        for _ in range(100):
+            if EmailOutbox.depth()["pending"] == 0:
+                break
+            worker._stop.wait(0.01)
+    finally:
+        worker.stop(timeout=1)
+    smtp_server.assert_count(3)
+
+
+def test_backoff_delay():
+    assert [backoff_delay(n, 30, 100) for n in (1, 2, 3, 4)] == [30, 60, 100, 100]
@@ -1,10 +1,17 @@
 import pytest  # noqa
+from datetime import timedelta
 from typing import Dict
+from unittest import mock
 
-from app.schemas.user import UserCreate, UserUpdate
+from app.core import config
+from app.core.cache import CountCache, SnapshotCache
+from app.db.base_class import ModelExistError
+from app.db.session import SessionScope, engine
+from app.schemas.user import UserCreate, UserUpdate, UserUpdateFull
 from app.models.user import User as UserModel
 
 from sqlalchemy.orm import Session
+from sqlalchemy_mixins import ModelNotFoundError
 
 pytestmark = pytest.mark.functional
 
@@ -34,6 +41,106 @@ def test_create_user(base_user: Dict):
     assert user.hashed_password
 
 
+@pytest.mark.usefixtures("db")
+def test_create_existing_user(users: Dict, base_user: Dict):
+    user_in = UserCreate(**{**base_user, "email": users[1]["email"]})
+    with pytest.raises(ModelExistError):
+        UserModel.create(user_in)
+    # the session is still usable
+    assert UserModel.get(email=users[1]["email"])
+
+
+@pytest.mark.usefixtures("db")
+def test_create_existing_user_keeps_the_transaction(users: Dict, base_user: Dict):
+    """A duplicate only rolls back its own insert"""
+    user = UserModel.find(users[0]["id"])
+    user.update(UserUpdate(full_name="Changed"))
+    with pytest.raises(ModelExistError):
+        UserModel.create(UserCreate(**{**base_user, "email": users[1]["email"]}))
+    user.session.expire_all()
+    assert UserModel.find(users[0]["id"]).full_name == "Changed"
+
+
+@pytest.mark.usefixtures("db")
+def test_create_existing_user_other_case(users: Dict, base_user: Dict):
+    user_in = UserCreate(**{**base_user, "email": users[1]["email"].upper()})
+    with pytest.raises(ModelExistError):
+        UserModel.create(user_in)
+
+
+@pytest.mark.usefixtures("db")
+def test_get_user_by_email(users: Dict):
+    user = UserModel.get_by_email(f' {users[1]["email"].upper()}')
+    assert user.id == users[1]["id"]
+    assert user.email == users[1]["email"]
+
+
+@pytest.mark.usefixtures("db")
+def test_find_by(users: Dict):
+    """Baked lookups should not mix the columns"""
+    user = UserModel.find_by("email_normalized", users[1]["email"].lower())
+    assert user.id == users[1]["id"]
+    assert UserModel.find_by("full_name", users[2]["full_name"]).id == users[2]["id"]
+    assert UserModel.find_by("email_normalized", "nobody@fastapi.test") is None
+
+
+@pytest.mark.usefixtures("db")
+def test_find_or_fail(users: Dict):
+    assert UserModel.find_or_fail(users[1]["id"]).email == users[1]["email"]
+    with pytest.raises(ModelNotFoundError):
+        UserModel.find_or_fail(123456)
+
+
+@pytest.mark.usefixtures("db")
+def test_update_email_normalized(users: Dict):
+    user = UserModel.find(users[1]["id"])
+    user.update(UserUpdateFull(email="New.Email@fastapi.test"))
+    assert user.email_normalized == "new.email@fastapi.test"
+    assert UserModel.get_by_email("NEW.email@fastapi.test").id == user.id
+
+
+@pytest.mark.usefixtures("db")
+def test_authenticate_user_other_case(normal_users: Dict):
+    user = UserModel.authenticate(
+        email=normal_users[0]["email"].upper(),
+        password=normal_users[0]["password"],
+    )
+    assert user.id == normal_users[0]["id"]
+
+
+@pytest.mark.usefixtures("db")
+def test_create_or_update_user(users: Dict, base_user: Dict):
+    user = UserModel.create_or_update(UserCreate(**base_user, full_name="New"))
+    assert user.id
+    assert user.full_name == "New"
+    assert user.is_active
+    assert user.verify_password(base_user["password"])
+
+    updated = UserModel.create_or_update(UserCreate(**base_user, full_name="Updated"))
+    assert updated.id == user.id
+    assert updated.full_name == "Updated"
+
+    existing = UserModel.create_or_update(UserCreate(email=users[1]["email"], password=base_user["password"]))
+    assert existing.id == users[1]["id"]
+    assert existing.full_name == users[1]["full_name"]
+    assert existing.verify_password(base_user["password"])
+
+
+@pytest.mark.usefixtures("db")
+def test_create_or_update_keeps_unset_columns(admin: Dict):
+    """Column defaults must not overwrite an existing user"""
+    user = UserModel.find(admin["id"])
+    user.password_set = True
+    user.session.flush()
+
+    updated = UserModel.create_or_update(UserCreate(email=admin["email"], full_name="Renamed"))
+    assert updated.id == admin["id"]
+    assert updated.full_name == "Renamed"
+    assert updated.is_superuser
+    assert updated.password_set
+    assert updated.verify_password(admin["password"])
+
+
 @pytest.mark.usefixtures("db")
 def test_authenticate_user(normal_users: Dict):
     user = UserModel.get(email=normal_users[0]["email"])
@@ -46,12 +153,64 @@ def test_authenticate_user(normal_users: Dict):
     assert user.email == normal_users[0]["email"]
 
 
+@pytest.mark.usefixtures("db")
+def test_authenticate_writes_only_changes(normal_users: Dict):
+    """A successful login should not update a user that has no failure"""
+    credentials = {
+        "email": normal_users[0]["email"],
+        "password": normal_users[0]["password"],
+    }
+    user = UserModel.get_by_email(credentials["email"])
+    user.login_retry = 2
+    user.password_set = True
+    UserModel.session.flush()
+
+    assert UserModel.authenticate(**credentials).login_retry == 0
+    assert UserModel.session.is_modified(user)
+    UserModel.session.flush()
+
+    assert UserModel.authenticate(**credentials)
+    assert not UserModel.session.is_modified(user)
+    user.password_set = False
+    UserModel.session.flush()
+
+
 @pytest.mark.usefixtures("db")
 def test_not_authenticate_user(base_user: Dict):
     user = UserModel.authenticate(**base_user)
     assert user is None
 
 
+@pytest.mark.usefixtures("db")
+def test_authenticate_locked_user(normal_users: Dict):
+    credentials = {
+        "email": normal_users[0]["email"],
+        "password": normal_users[0]["password"],
+    }
+    with mock.patch.object(config, "LOGIN_MAX_RETRY", 2):
+        for i in range(2):
+            assert UserModel.authenticate(credentials["email"], "totallywrong") is None
+        user = UserModel.get(email=credentials["email"])
+        assert user.login_retry == 2
+        assert user.is_locked()
+        assert UserModel.authenticate(**credentials) is None
+
+
+@pytest.mark.usefixtures("db")
+def test_lock_expires_after_the_last_failure(normal_users: Dict):
+    """Other updates of the user must not extend the lock"""
+    email = normal_users[0]["email"]
+    with mock.patch.object(config, "LOGIN_MAX_RETRY", 2):
+        for i in range(2):
+            assert UserModel.authenticate(email, "totallywrong") is None
+        user = UserModel.get(email=email)
+        assert user.is_locked()
+
+        user.last_failed_login -= timedelta(seconds=config.LOGIN_LOCK_DURATION + 1)
+        user.update(UserUpdate(full_name="Changed"))
+        assert not user.is_locked()
+
+
 @pytest.mark.usefixtures("db")
 def test_check_if_user_is_active(normal_users: Dict):
     user = UserModel.get(email=normal_users[0]["email"])
@@ -89,3 +248,58 @@ def test_find_user(users: Dict):
     user = UserModel.find(users[0]["id"])
     assert user, "User not found"
     assert user.email == users[0]["email"], "User email do not match"
+
+
+@pytest.mark.usefixtures("db")
+def test_find_cached_user(users: Dict):
+    cache = SnapshotCache(maxsize=10, ttl=60)
+    with mock.patch("app.models.user.user_cache", cache):
+        user = UserModel.find_cached(users[0]["id"])
+        assert cache.get(users[0]["id"])["email"] == users[0]["email"]
+        cached = UserModel.find_cached(users[0]["id"])
+        assert cached.email == user.email
+        assert cached.hashed_password, "Attributes out of the cache should load"
+
+
+@pytest.mark.usefixtures("db")
+def test_update_invalidates_cached_user(users: Dict):
+    cache = SnapshotCache(maxsize=10, ttl=60)
+    with mock.patch("app.models.user.user_cache", cache):
+        user = UserModel.find_cached(users[0]["id"])
+        user.update(UserUpdate(full_name="New name"))
+        assert cache.get(users[0]["id"]) is None
+
+
+@pytest.mark.usefixtures("db")
+def test_commit_invalidates_cached_user(users: Dict, monkeypatch):
+    """A snapshot cached by another request before the commit must go"""
+    cache = SnapshotCache(maxsize=10, ttl=60)
+    table = UserModel.__table__
+    # a session of its own, really committed
+    monkeypatch.setattr(SessionScope.registry, "scopefunc", lambda: "commit")
+    with mock.patch("app.models.user.user_cache", cache):
+        try:
+            user = UserModel.find_or_fail(users[0]["id"])
+            user.update(UserUpdate(full_name="Committed"))
+            cache.set(user.id, {"id": user.id, "full_name": users[0]["full_name"]})
+            SessionScope().commit()
+            assert cache.get(user.id) is None
+        finally:
+            SessionScope.remove()
+            engine.execute(table.update().where(table.c.id == users[0]["id"]).values(
+                full_name=users[0]["full_name"],
+                time_updated=None,
+            ))
+
+
+@pytest.mark.usefixtures("db")
+def test_count_users(users: Dict, base_user: Dict):
+    cache = CountCache(ttl=60)
+    with mock.patch("app.db.base_class.count_cache", cache):
+        assert UserModel.count_all() == len(users)
+        assert cache.get("user") == len(users)
+
+        user = UserModel.create(UserCreate(**base_user))
+        assert UserModel.count_all() == len(users) + 1
+        user.delete()
+        assert UserModel.count_all() == len(users)
@@ -0,0 +1,95 @@
+@integration
+Feature: Async user endpoints
+    As a user
+    I want the endpoints on the async database driver to behave like the others
+
+Background:
+    Given Some users are in the system
+    And The server is set to not check corrupted passwords
+    And The server is set to not check special chars in passwords
+    And I have a smtp server running
+
+
+# ----------------------------------------------------------------------------
+# Login
+# ----------------------------------------------------------------------------
+Scenario: Async login as a user
+    Given I'm an active user
+    When I request a token on the async endpoint
+    Then I should get a '200' response
+    And The response should contain an access token
+
+Scenario: Async login with a wrong password
+    Given I'm a new user
+    When I request a token on the async endpoint
+    Then I should get a '400' response
+    And The response should only contain the error
+
+
+# ----------------------------------------------------------------------------
+# Retrieve accounts
+# ----------------------------------------------------------------------------
+Scenario: Async retrieve my account
+    Given I'm an active user
+    And I have a valid token
+    When I retrieve my profile on the async endpoint
+    Then I should get a '200' response
+    And The following user fields should match: "email"
+    And The response should not contain the password hash
+
+Scenario: Async listing users
+    Given I'm an admin
+    And I have a valid token
+    When I retrieve the list of users on the async endpoint
+    Then I should get a '200' response
+    And The list should contain the first 2 users
+    And The list should not contain passwords
+
+Scenario: Async listing users without privileges
+    Given I'm an active user
+    And I have a valid token
+    When I retrieve the list of users on the async endpoint
+    Then I should get a '403' response
+
+Scenario: Async retrieve any account as an admin
+    Given I'm an admin
+    And I have a valid token
+    When I retrieve the user "Dupond" on the async endpoint
+    Then I should get a '200' response
+    And The following user fields should match: "email"
+
+Scenario: Async retrieve a non-existing account as an admin
+    Given I'm an admin
+    And I have a valid token
+    When I retrieve the user by id "9999999" on the async endpoint
+    Then I should get a '404' response
+
+
+# ----------------------------------------------------------------------------
+# Create an account
+# ----------------------------------------------------------------------------
+Scenario: Async account creation as an admin
+    Given I'm an admin
+    And I have a valid token
+    And I have a new user
+    When I create an account on the async endpoint
+    Then I should get a '200' response
+    And The following user fields should match: "email"
+    And It should be active
+
+Scenario: Async account creation with an unavailable email
+    Given I'm an admin
+    And I have a valid token
+    And I have a new user
+    When I create an account on the async endpoint
+    And I create an account on the async endpoint
+    Then I should get a '400' response
+
+Scenario: Login with an account created on the async endpoint
+    Given I'm an admin
+    And I have a valid token
+    And I have a new user
+    When I create an account on the async endpoint
+    And I request a token on the async endpoint
+    Then I should get a '200' response
+    And The response should contain an access token
@@ -0,0 +1,42 @@
+@integration
+Feature: Database session of the requests
+    As a maintainer
+    I want the requests to only finish the database session they used
+
+Background:
+    Given Some users are in the system
+    And I spy on the database session
+
+
+Scenario: A read request is rolled back
+    Given I'm an active user
+    And I have a valid token
+    When I send a GET request to "/me"
+    Then I should get a '200' response
+    And The session should be rolled back
+    And The session should not be committed
+
+Scenario: A write request is committed
+    Given I'm an active user
+    And I have a valid token
+    When I send a POST request to "/login/test-token"
+    Then I should get a '200' response
+    And The session should be committed
+
+Scenario: A preflight request does not use the database
+    Given Requests get their own database session
+    When I send a preflight request to "/me"
+    Then I should get a '200' response
+    And No database session should be created
+    And The session should not be committed
+    And The session should not be rolled back
+
+Scenario: A route without the database does not use a session
+    Given Requests get their own database session
+    And There is a route that does not use the database
+    When I send a GET request to "/tests/no-db"
+    Then I should get a '200' response
+    And The route should not have a database session
+    And No database session should be created
+    And The session should not be committed
+    And The session should not be rolled back
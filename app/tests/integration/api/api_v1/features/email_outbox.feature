@@ -0,0 +1,31 @@
+@integration
+Feature: Email outbox
+    As a maintainer
+    I want the emails to be sent by a worker after the request
+
+Background:
+    Given Some users are in the system
+    And I have a smtp server running
+
+
+Scenario: A request stores the email in the outbox
+    Given I'm an active user
+    And The server sends the emails through the outbox
+    When I request a new password
+    Then I should get a '200' response
+    And I should not receive an email
+    And The password recovery email should be in the outbox
+
+Scenario: Outbox statistics
+    Given There are emails in the outbox
+    And I'm an admin
+    And I have a valid token
+    When I retrieve the outbox statistics
+    Then I should get a '200' response
+    And The outbox should have 3 pending emails and 0 failed
+
+Scenario: Outbox statistics without privileges
+    Given I'm an active user
+    And I have a valid token
+    When I retrieve the outbox statistics
+    Then I should get a '403' response
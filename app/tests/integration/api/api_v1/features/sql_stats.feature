@@ -0,0 +1,34 @@
+@integration
+Feature: SQL statistics of the requests
+    As a maintainer
+    I want to know the queries each request runs
+
+Background:
+    Given Some users are in the system
+    And I record the warnings
+
+
+Scenario: The query count and time are sent
+    Given I'm an active user
+    And I have a valid token
+    When I retrieve my profile
+    Then I should get a '200' response
+    And The server timing should count at least 1 query
+
+Scenario: A request without queries
+    When I request a page that does not exist
+    Then I should get a '404' response
+    And The server timing should count 0 queries
+
+Scenario: Repeated statements are flagged
+    Given There is a route that loads the users one by one
+    When I retrieve the users one by one
+    Then I should get a '200' response
+    And A query run once per user should be flagged
+
+Scenario: Single statements are not flagged
+    Given I'm an active user
+    And I have a valid token
+    When I retrieve my profile
+    Then I should get a '200' response
+    And No query should be flagged
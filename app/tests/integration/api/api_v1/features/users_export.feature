@@ -0,0 +1,40 @@
+@integration
+Feature: Users export
+    As an admin
+    I want to download all the accounts
+
+Background:
+    Given Some users are in the system
+
+
+Scenario: Exporting users as NDJSON
+    Given I'm an admin
+    And I have a valid token
+    And The server fetches the users by batches of 2
+    When I export the users
+    Then I should get a '200' response
+    And The export should be in the "application/x-ndjson" format
+    And The export should contain every user
+    And The export should contain the creation time
+    And The export should not contain passwords
+
+Scenario: Exporting users as CSV
+    Given I'm an admin
+    And I have a valid token
+    When I export the users as "csv"
+    Then I should get a '200' response
+    And The export should be in the "text/csv" format
+    And The export should contain every user
+    And The export should not contain passwords
+
+Scenario: Exporting users in an unknown format
+    Given I'm an admin
+    And I have a valid token
+    When I export the users as "xml"
+    Then I should get a '400' response
+
+Scenario: Exporting users without privileges
+    Given I'm an active user
+    And I have a valid token
+    When I export the users
+    Then I should get a '403' response
@@ -0,0 +1,42 @@
+@integration
+Feature: Users import
+    As an admin
+    I want to create many accounts from a file
+
+Background:
+    Given Some users are in the system
+
+
+Scenario: Importing users from NDJSON
+    Given I'm an admin
+    And I have a valid token
+    And The server imports the users by batches of 2
+    When I import users from a NDJSON file
+    Then I should get a '200' response
+    And The import should send 3 progress lines
+    And The import should process 6 lines, create 2 users and fail on 4
+    And The import should report errors on the lines "3, 4, 5, 7"
+    And The email error should be on line 3
+    And The existing email error should be on line 4
+    And The NDJSON users should be imported with their fields
+
+Scenario: Importing users from CSV
+    Given I'm an admin
+    And I have a valid token
+    When I import users from a CSV file
+    Then I should get a '200' response
+    And The import should process 4 lines, create 3 users and fail on 1
+    And The import should report errors on the lines "5"
+    And The CSV users should be imported with their fields
+
+Scenario: Importing users from an unsupported format
+    Given I'm an admin
+    And I have a valid token
+    When I import users from a JSON file
+    Then I should get a '415' response
+
+Scenario: Importing users without privileges
+    Given I'm an active user
+    And I have a valid token
+    When I import users from a CSV file
+    Then I should get a '403' response
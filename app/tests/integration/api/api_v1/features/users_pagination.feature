@@ -0,0 +1,90 @@
+@integration
+Feature: Users pagination
+    As an admin
+    I want to browse the list of users page by page
+
+Background:
+    Given Some users are in the system
+    And I'm an admin
+    And I have a valid token
+
+
+# ----------------------------------------------------------------------------
+# Cursors
+# ----------------------------------------------------------------------------
+Scenario: Listing all the users with the next cursors
+    When I retrieve all the users by pages of 2
+    Then I should get a '200' response
+    And I should have retrieved every user in order
+
+Scenario: Listing the first users
+    When I retrieve the first 2 users
+    Then I should get a '200' response
+    And The list should contain the users 1 to 2
+    And The response should not have a previous cursor
+
+Scenario: Listing the next users with the next cursor
+    When I retrieve the first 2 users
+    And I retrieve the next 2 users
+    Then I should get a '200' response
+    And The list should contain the users 3 to 4
+
+Scenario: Going back with the previous cursor
+    When I retrieve the first 2 users
+    And I retrieve the next 2 users
+    And I retrieve the previous 2 users
+    Then I should get a '200' response
+    And The list should contain the users 1 to 2
+    And The response should not have a previous cursor
+
+Scenario: Listing users by creation time
+    When I retrieve the first 3 users ordered by "time_creation"
+    And I retrieve the next 3 users ordered by "time_creation"
+    Then I should get a '200' response
+    And The two pages should not share any user
+
+Scenario: Listing users with an invalid cursor
+    When I retrieve the users with the cursor "invalid"
+    Then I should get a '400' response
+
+Scenario: Listing users ordered by a forbidden column
+    When I retrieve the users ordered by "hashed_password"
+    Then I should get a '400' response
+
+Scenario: Listing users with a cursor of another order
+    When I retrieve the users ordered by "time_creation" with a cursor on "id"
+    Then I should get a '400' response
+
+Scenario: Listing more users than allowed
+    Given The server sends at most 2 users per page
+    When I retrieve the first 1000 users
+    Then I should get a '200' response
+    And The list should contain 2 users
+
+
+# ----------------------------------------------------------------------------
+# Headers
+# ----------------------------------------------------------------------------
+Scenario: Listing users sends the total and the links
+    When I retrieve the first 2 users
+    Then I should get a '200' response
+    And The total count should be the number of users
+    And The response should link to the next page
+    And The response should not link to the previous page
+
+Scenario: Following the next link
+    When I retrieve the first 2 users
+    And I follow the next link
+    Then I should get a '200' response
+    And The list should contain the users 3 to 4
+    And The previous link should use the previous cursor
+
+Scenario: Listing users by page sends the links to the other pages
+    When I retrieve the page 2 of 2 users
+    Then I should get a '200' response
+    And The response should link to the first, previous, next and last pages
+
+Scenario: Listing users by page starts at page 1
+    When I retrieve the page 0 of 2 users
+    Then I should get a '422' response
+    And The response error type should be "value_error.number.not_ge"
@@ -366,28 +366,6 @@ def check_not_admin(
     assert not r["is_superuser"]
 
 
-@then("I should be active")
-@then("It should be active")
-def check_active(
-    response: Response,
-) -> None:
-    """Ensure that the returned user is active"""
-    r = response.json()
-    assert "is_active" in r
-    assert r["is_active"]
-
-
-@then("I should be inactive")
-@then("It should be inactive")
-def check_inactive(
-    response: Response,
-) -> None:
-    """Ensure that the returned user is active"""
-    r = response.json()
-    assert "is_active" in r
-    assert not r["is_active"]
-
-
 @then('The response should be empty')
 def check_empty_response(response: Response) -> None:
     """Ensure that no response is returned"""
@@ -395,27 +373,6 @@ def check_empty_response(response: Response) -> None:
     assert r is None
 
 
-@then("The response should only contain the error")
-def check_empty_error_response(
-    response: Response,
-) -> None:
-    """Ensure that error response do not leak informations"""
-    r = response.json()
-    assert "detail" in r
-    assert len(r) == 1
-
-
-@then(parsers.re('The response error type should be "(?P<error>.+)"'))
-def check_error_type(
-    response: Response,
-    error: str,
-) -> None:
-    """Ensure that the response return the proper error types"""
-    r = response.json()
-    assert r["detail"][0]["type"]
-    assert r["detail"][0]["type"] == error
-
-
 @then(parsers.re('The response error should contain "(?P<error>.+)"'))
 def check_error_response(
     response: Response,
@@ -468,30 +425,6 @@ def check_page_content(
         i += 1
 
 
-@then("The list should not contain passwords")
-def check_list_user_passwords(
-    response: Response
-) -> None:
-    """Ensure that the user list return matches the test base"""
-    r = response.json()
-    for user in r:
-        assert "password" not in user, "password is present!"
-        assert "hashed_password" not in user, "hashed password is present!"
-
-
-@then(parsers.re(r'The following user fields should match: "(?P<listing>.+)"'))
-def field_matching(
-    response: Response,
-    data: Dict[str, str],
-    listing: str
-) -> None:
-    """Check that the given response fields match the current user"""
-    r = response.json()
-    for field in [f.strip() for f in listing.split(',')]:
-        assert field in r
-        assert r[field] == data[field]
-
-
 # @then(parsers.re(r'The response should contain the following fields: "(?P<listing>.+)"'))
 # def fields_exist(
 #     response: Response,
@@ -0,0 +1,133 @@
+"""Testing the endpoints on the async database driver
+Uses pytest-bdd
+See features/ for the Gerkan definitions
+"""
+from typing import Callable, Dict
+
+import pytest  # noqa
+from pytest_bdd import parsers, scenarios, then, when
+from requests.models import Response
+
+from app.db.session import engine
+from app.models.user import User as UserModel
+
+scenarios("features/async_users.feature")
+
+# async queries are committed, they are not undone with the test session
+pytestmark = pytest.mark.usefixtures("restore_users")
+
+
+@pytest.fixture
+def restore_users(db, users_hashed: Dict, base_user: Dict):
+    """Restore the users modified by the async queries"""
+    yield
+    table = UserModel.__table__
+    for user in users_hashed:
+        engine.execute(table.update().where(table.c.id == user["id"]).values(
+            hashed_password=user["hashed_password"],
+            login_retry=None,
+            last_failed_login=None,
+        ))
+    engine.execute(table.delete().where(table.c.email == base_user["email"]))
+
+
+# -----------------------------------------------------------------------------
+# WHEN
+# -----------------------------------------------------------------------------
+
+@when("I request a token on the async endpoint")
+def request_token(
+    post: Callable,
+    context: Dict,
+    user: Dict[str, str],
+) -> None:
+    """Trying to get a token and store the response"""
+    credentials = {
+        "username": user["email"],
+        "password": user["password"]
+    }
+    context.data = user
+    context.response = post("/async/login/access-token", data=credentials)
+
+
+@when("I retrieve my profile on the async endpoint")
+def get_profile(
+    get: Callable,
+    context: Dict,
+    user: Dict,
+) -> None:
+    """Retrieve a profile and store the response"""
+    context.data = user
+    context.response = get("/async/me")
+
+
+@when("I retrieve the list of users on the async endpoint")
+def get_users(
+    get: Callable,
+    context: Dict,
+) -> None:
+    """Retrieve the first users and store the response"""
+    context.response = get("/async/users/?limit=2")
+
+
+@when(parsers.parse('I retrieve the user by id "{user_id:d}" on the async endpoint'))
+def get_user_by_id(
+    get: Callable,
+    context: Dict,
+    user_id: int,
+) -> None:
+    """Get a user profile by its id and store the reponse"""
+    context.response = get(f"/async/users/{user_id}")
+
+
+@when(parsers.parse('I retrieve the user "{fullname:l}" on the async endpoint'))
+def get_user(
+    get: Callable,
+    context: Dict,
+    users: Dict,
+    fullname: str,
+) -> None:
+    """Get a user profile by its name and store the reponse"""
+    user = next(filter(lambda user: user['full_name'] == fullname, users))
+    context.data = user
+    context.response = get(f"/async/users/{user['id']}")
+
+
+@when("I create an account on the async endpoint")
+def create_account(
+    post: Callable,
+    context: Dict,
+    user: Dict[str, str],
+) -> None:
+    """Create an account and store the response"""
+    context.data = user
+    context.response = post("/async/users/", json=user)
+
+
+# -----------------------------------------------------------------------------
+# THEN
+# -----------------------------------------------------------------------------
+
+@then("The response should contain an access token")
+def check_access_token(
+    response: Response,
+) -> None:
+    r = response.json()
+    assert r["access_token"]
+    assert r["token_type"] == "bearer"
+
+
+@then("The response should not contain the password hash")
+def check_password_hash_absent(
+    response: Response,
+) -> None:
+    assert "hashed_password" not in response.json()
+
+
+@then(parsers.parse("The list should contain the first {n:d} users"))
+def check_first_users(
+    response: Response,
+    users: Dict,
+    n: int,
+) -> None:
+    assert [user["id"] for user in response.json()] == [user["id"] for user in users[:n]]
@@ -0,0 +1,123 @@
+"""Testing the database session of the requests
+Uses pytest-bdd
+See features/ for the Gerkan definitions
+"""
+from typing import Callable, Dict, List
+from unittest import mock
+
+import pytest  # noqa
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from app.api.utils.db import no_db
+from app.core import config
+from app.db.session import SessionScope, _current_scope
+from app.main import app
+
+scenarios("features/db_session.feature")
+
+
+# -----------------------------------------------------------------------------
+# GIVEN…
+# For generic @given, see conftest.py
+# -----------------------------------------------------------------------------
+
+@given("I spy on the database session")
+def session_spy(db) -> Dict:
+    """Replace the end of the session by mocks"""
+    with mock.patch.object(SessionScope, "commit") as commit, \
+            mock.patch.object(SessionScope, "rollback") as rollback:
+        yield {"commit": commit, "rollback": rollback}
+
+
+@given("Requests get their own database session")
+def created_sessions(monkeypatch) -> List:
+    """The scoping of the application, the tests share one session.
+    Return the list of the sessions created since"""
+    sessions = []
+    create = SessionScope.registry.createfunc
+
+    def createfunc():
+        sessions.append(create())
+        return sessions[-1]
+
+    monkeypatch.setattr(SessionScope.registry, "scopefunc", _current_scope)
+    monkeypatch.setattr(SessionScope.registry, "createfunc", createfunc)
+    return sessions
+
+
+@given("There is a route that does not use the database")
+def no_db_route() -> List:
+    """Add a route depending on no_db, return whether each request had a
+    session when the route ran"""
+    has_session = []
+
+    def no_db_endpoint():
+        has_session.append(SessionScope.registry.has())
+
+    app.add_api_route(f"{config.API_V1_STR}/tests/no-db", no_db_endpoint, dependencies=[Depends(no_db)])
+    route = app.router.routes[-1]
+    yield has_session
+    app.router.routes.remove(route)
+
+
+# -----------------------------------------------------------------------------
+# WHEN
+# -----------------------------------------------------------------------------
+
+@when(parsers.parse('I send a {method:w} request to "{url}"'))
+def send_request(
+    api_request: Callable,
+    context: Dict,
+    method: str,
+    url: str,
+) -> None:
+    context.response = api_request(method.lower())(url)
+
+
+@when(parsers.parse('I send a preflight request to "{url}"'))
+def send_preflight_request(
+    client: TestClient,
+    context: Dict,
+    url: str,
+) -> None:
+    """A CORS preflight request, answered by the CORS middleware"""
+    context.response = client.options(f"{config.API_V1_STR}{url}", headers={
+        "Origin": "http://localhost",
+        "Access-Control-Request-Method": "GET",
+    })
+
+
+# -----------------------------------------------------------------------------
+# THEN
+# -----------------------------------------------------------------------------
+
+@then("The session should be committed")
+def check_committed(session_spy: Dict) -> None:
+    session_spy["commit"].assert_called_once()
+
+
+@then("The session should not be committed")
+def check_not_committed(session_spy: Dict) -> None:
+    session_spy["commit"].assert_not_called()
+
+
+@then("The session should be rolled back")
+def check_rolled_back(session_spy: Dict) -> None:
+    session_spy["rollback"].assert_called_once()
+
+
+@then("The session should not be rolled back")
+def check_not_rolled_back(session_spy: Dict) -> None:
+    session_spy["rollback"].assert_not_called()
+
+
+@then("No database session should be created")
+def check_no_session(created_sessions: List) -> None:
+    assert created_sessions == []
+
+
+@then("The route should not have a database session")
+def check_route_session(no_db_route: List) -> None:
+    assert no_db_route == [False]
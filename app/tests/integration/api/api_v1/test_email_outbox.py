@@ -0,0 +1,85 @@
+"""Testing the email outbox of the requests
+Uses pytest-bdd
+See features/ for the Gerkan definitions
+"""
+from typing import Callable, Dict, List
+from unittest import mock
+
+import pytest  # noqa
+from pytest_bdd import given, parsers, scenarios, then, when
+from requests.models import Response
+
+from app.core import config
+from app.models.email_outbox import EmailOutbox
+
+scenarios("features/email_outbox.feature")
+
+
+# -----------------------------------------------------------------------------
+# GIVEN…
+# For generic @given, see conftest.py
+# -----------------------------------------------------------------------------
+
+@given("The server sends the emails through the outbox")
+def enqueued_emails() -> List[EmailOutbox]:
+    """Enable the outbox, return the emails stored by the requests"""
+    enqueued = []
+    original = EmailOutbox.enqueue
+
+    def enqueue(*args):
+        enqueued.append(original(*args))
+        # flushed in the transaction of the request, rolled back by the tests
+        assert enqueued[-1].id
+        return enqueued[-1]
+
+    with mock.patch.object(config, "EMAILS_OUTBOX", True), \
+            mock.patch.object(EmailOutbox, "enqueue", side_effect=enqueue):
+        yield enqueued
+
+
+# -----------------------------------------------------------------------------
+# WHEN
+# -----------------------------------------------------------------------------
+
+@when("I request a new password")
+def pasword_recovery(
+    post: Callable,
+    context: Dict,
+    user: Dict[str, str],
+) -> None:
+    context.response = post(f'/password-recovery/{user["email"]}')
+
+
+@when("I retrieve the outbox statistics")
+def get_outbox_stats(
+    get: Callable,
+    context: Dict,
+) -> None:
+    context.response = get("/utils/email-outbox/")
+
+
+# -----------------------------------------------------------------------------
+# THEN
+# -----------------------------------------------------------------------------
+
+@then("The password recovery email should be in the outbox")
+def check_enqueued(
+    enqueued_emails: List[EmailOutbox],
+    user: Dict,
+) -> None:
+    assert len(enqueued_emails) == 1
+    assert enqueued_emails[0].email_to == user["email"]
+    assert "Password recovery" in enqueued_emails[0].subject
+    assert "<html" in enqueued_emails[0].html
+
+
+@then(parsers.parse("The outbox should have {pending:d} pending emails and {failed:d} failed"))
+def check_outbox_stats(
+    response: Response,
+    pending: int,
+    failed: int,
+) -> None:
+    stats = response.json()
+    assert stats["pending"] == pending
+    assert stats["failed"] == failed
+    assert stats["oldest_pending_s"] >= 0
@@ -0,0 +1,114 @@
+"""Testing the SQL statistics of the requests
+Uses pytest-bdd
+See features/ for the Gerkan definitions
+"""
+import logging
+from typing import Callable, Dict, List
+
+import pytest  # noqa
+from pytest_bdd import given, parsers, scenarios, then, when
+from requests.models import Response
+
+from app.core import config
+from app.main import app
+from app.models.user import User as UserModel
+
+scenarios("features/sql_stats.feature")
+
+N_PLUS_ONE_URL = "/tests/n-plus-one"
+
+
+def _n_plus_one_warnings(caplog) -> List[str]:
+    return [r.getMessage() for r in caplog.records if "likely N+1 query" in r.getMessage()]
+
+
+# -----------------------------------------------------------------------------
+# GIVEN…
+# For generic @given, see conftest.py
+# -----------------------------------------------------------------------------
+
+@given("I record the warnings")
+def recorded_warnings(caplog):
+    caplog.set_level(logging.WARNING)
+    return caplog
+
+
+@given("There is a route that loads the users one by one")
+def n_plus_one_route() -> None:
+    """A route that loads the users one by one, as a lazy relationship would"""
+    def users_one_by_one():
+        ids = [id for id, in UserModel.session.query(UserModel.id)]
+        return [UserModel.query.filter_by(id=id).one().email for id in ids]
+
+    app.add_api_route(f"{config.API_V1_STR}{N_PLUS_ONE_URL}", users_one_by_one)
+    route = app.router.routes[-1]
+    yield
+    app.router.routes.remove(route)
+
+
+# -----------------------------------------------------------------------------
+# WHEN
+# -----------------------------------------------------------------------------
+
+@when("I retrieve my profile")
+def get_profile(
+    get: Callable,
+    context: Dict,
+) -> None:
+    context.response = get("/me")
+
+
+@when("I request a page that does not exist")
+def get_not_found(
+    get: Callable,
+    context: Dict,
+) -> None:
+    context.response = get("/not-found")
+
+
+@when("I retrieve the users one by one")
+def get_users_one_by_one(
+    get: Callable,
+    context: Dict,
+) -> None:
+    context.response = get(N_PLUS_ONE_URL)
+
+
+# -----------------------------------------------------------------------------
+# THEN
+# -----------------------------------------------------------------------------
+
+@then(parsers.parse("The server timing should count at least {n:d} query"))
+def check_min_queries(
+    response: Response,
+    n: int,
+) -> None:
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert int(timing.split('desc="')[1].split(" ")[0]) >= n
+
+
+@then(parsers.parse("The server timing should count {n:d} queries"))
+def check_queries(
+    response: Response,
+    n: int,
+) -> None:
+    assert response.headers["server-timing"].endswith(f'desc="{n} queries"')
+
+
+@then("A query run once per user should be flagged")
+def check_flagged(
+    recorded_warnings,
+    users: Dict,
+) -> None:
+    assert len(users) >= config.SQL_REPEATED_THRESHOLD > 0
+    flagged = _n_plus_one_warnings(recorded_warnings)
+    assert len(flagged) == 1
+    assert f"run {len(users)} times" in flagged[0]
+
+
+@then("No query should be flagged")
+def check_not_flagged(
+    recorded_warnings,
+) -> None:
+    assert not _n_plus_one_warnings(recorded_warnings)
@@ -0,0 +1,92 @@
+"""Testing the export of users
+Uses pytest-bdd
+See features/ for the Gerkan definitions
+"""
+import csv
+import io
+import json
+from typing import Callable, Dict, List
+
+import pytest  # noqa
+from pytest_bdd import given, parsers, scenarios, then, when
+from requests.models import Response
+
+from app.tests.utils.utils import tweak_config
+
+scenarios("features/users_export.feature")
+
+URL = "/users/export"
+
+
+def _rows(response: Response) -> List[Dict]:
+    if response.headers["content-type"].startswith("text/csv"):
+        return list(csv.DictReader(io.StringIO(response.text)))
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+# -----------------------------------------------------------------------------
+# GIVEN…
+# For generic @given, see conftest.py
+# -----------------------------------------------------------------------------
+
+@given(parsers.parse("The server fetches the users by batches of {n:d}"))
+def export_fetch_size(n: int) -> None:
+    """Change the number of rows fetched at once"""
+    yield from tweak_config("USERS_EXPORT_FETCH_SIZE", n)
+
+
+# -----------------------------------------------------------------------------
+# WHEN
+# -----------------------------------------------------------------------------
+
+@when("I export the users")
+def export_users(
+    get: Callable,
+    context: Dict,
+) -> None:
+    context.response = get(URL)
+
+
+@when(parsers.parse('I export the users as "{format}"'))
+def export_users_as(
+    get: Callable,
+    context: Dict,
+    format: str,
+) -> None:
+    context.response = get(URL, params={"format": format})
+
+
+# -----------------------------------------------------------------------------
+# THEN
+# -----------------------------------------------------------------------------
+
+@then(parsers.parse('The export should be in the "{media_type}" format'))
+def check_media_type(
+    response: Response,
+    media_type: str,
+) -> None:
+    assert response.headers["content-type"].startswith(media_type)
+
+
+@then("The export should contain every user")
+def check_all_users(
+    response: Response,
+    users: Dict,
+) -> None:
+    assert [int(row["id"]) for row in _rows(response)] == [user["id"] for user in users]
+
+
+@then("The export should contain the creation time")
+def check_creation_time(
+    response: Response,
+) -> None:
+    assert all(row["time_creation"] for row in _rows(response))
+
+
+@then("The export should not contain passwords")
+def check_no_passwords(
+    response: Response,
+) -> None:
+    for row in _rows(response):
+        assert "password" not in row
+        assert "hashed_password" not in row
@@ -0,0 +1,162 @@
+"""Testing the import of users
+Uses pytest-bdd
+See features/ for the Gerkan definitions
+"""
+import json
+from typing import Dict, List
+
+import pytest  # noqa
+from fastapi.testclient import TestClient
+from pytest_bdd import given, parsers, scenarios, then, when
+from requests.models import Response
+
+from app.core import config
+from app.db.session import engine
+from app.models.user import User as UserModel
+from app.tests.utils.utils import tweak_config
+
+scenarios("features/users_import.feature")
+
+# the imports are committed, they are not undone with the test session
+pytestmark = pytest.mark.usefixtures("delete_imported_users")
+
+URL = f"{config.API_V1_STR}/users/import"
+EMAILS = [f"import{i}@fastapi.test" for i in range(5)]
+
+
+@pytest.fixture
+def delete_imported_users(db):
+    """Delete the imported users"""
+    yield
+    table = UserModel.__table__
+    engine.execute(table.delete().where(table.c.email.in_(EMAILS)))
+
+
+def _progress(response: Response) -> List[Dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+# -----------------------------------------------------------------------------
+# GIVEN…
+# For generic @given, see conftest.py
+# -----------------------------------------------------------------------------
+
+@given(parsers.parse("The server imports the users by batches of {n:d}"))
+def import_batch_size(n: int) -> None:
+    """Change the number of users inserted at once"""
+    yield from tweak_config("USERS_IMPORT_BATCH_SIZE", n)
+
+
+# -----------------------------------------------------------------------------
+# WHEN
+# -----------------------------------------------------------------------------
+
+@when("I import users from a NDJSON file")
+def import_ndjson(
+    client: TestClient,
+    headers: Dict,
+    context: Dict,
+    users: Dict,
+) -> None:
+    """Valid users, invalid ones and a line that is not JSON"""
+    rows = [
+        {"email": EMAILS[0], "password": "avalidpassword_99!", "full_name": "Zero"},
+        {"email": EMAILS[1], "is_superuser": True},
+        {"email": "invalid"},
+        {"email": users[1]["email"]},
+        {"email": EMAILS[1]},
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n\nnot json\n"
+    headers = {**headers, "Content-Type": "application/x-ndjson"}
+    context.response = client.post(URL, headers=headers, data=body)
+
+
+@when("I import users from a CSV file")
+def import_csv(
+    client: TestClient,
+    headers: Dict,
+    context: Dict,
+) -> None:
+    """Columns given by the header line, the last line is too short"""
+    body = "email,full_name,password\r\n" + "\r\n".join(
+        f"{email},User {i}," for i, email in enumerate(EMAILS[2:])
+    ) + "\r\nshort line"
+    headers = {**headers, "Content-Type": "text/csv"}
+    context.response = client.post(URL, headers=headers, data=body.encode())
+
+
+@when("I import users from a JSON file")
+def import_json(
+    client: TestClient,
+    headers: Dict,
+    context: Dict,
+) -> None:
+    headers = {**headers, "Content-Type": "application/json"}
+    context.response = client.post(URL, headers=headers, data="[]")
+
+
+# -----------------------------------------------------------------------------
+# THEN
+# -----------------------------------------------------------------------------
+
+@then(parsers.parse("The import should send {n:d} progress lines"))
+def check_progress_lines(
+    response: Response,
+    n: int,
+) -> None:
+    assert len(_progress(response)) == n
+
+
+@then(parsers.parse("The import should process {processed:d} lines, create {created:d} users and fail on {failed:d}"))
+def check_progress(
+    response: Response,
+    processed: int,
+    created: int,
+    failed: int,
+) -> None:
+    progress = _progress(response)[-1]
+    assert progress["done"]
+    assert progress["processed"] == processed
+    assert progress["created"] == created
+    assert progress["failed"] == failed
+
+
+@then(parsers.parse('The import should report errors on the lines "{lines}"'))
+def check_error_lines(
+    response: Response,
+    lines: str,
+) -> None:
+    errors = [error["line"] for progress in _progress(response) for error in progress["errors"]]
+    assert sorted(errors) == [int(line) for line in lines.split(",")]
+
+
+@then(parsers.parse("The email error should be on line {line:d}"))
+def check_email_error(
+    response: Response,
+    line: int,
+) -> None:
+    errors = {error["line"]: error for progress in _progress(response) for error in progress["errors"]}
+    assert errors[line]["loc"] == ["email"]
+
+
+@then(parsers.parse("The existing email error should be on line {line:d}"))
+def check_existing_email_error(
+    response: Response,
+    line: int,
+) -> None:
+    errors = {error["line"]: error for progress in _progress(response) for error in progress["errors"]}
+    assert errors[line]["type"] == "value_error.exists"
+
+
+@then("The NDJSON users should be imported with their fields")
+def check_ndjson_users() -> None:
+    user = UserModel.get(email=EMAILS[0])
+    assert user.full_name == "Zero"
+    assert user.verify_password("avalidpassword_99!")
+    assert UserModel.get(email=EMAILS[1]).is_superuser
+
+
+@then("The CSV users should be imported with their fields")
+def check_csv_users() -> None:
+    for i, email in enumerate(EMAILS[2:]):
+        assert UserModel.get(email=email).full_name == f"User {i}"
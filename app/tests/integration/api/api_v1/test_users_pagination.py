@@ -0,0 +1,243 @@
+"""Testing the pagination of the users
+Uses pytest-bdd
+See features/ for the Gerkan definitions
+"""
+from typing import Callable, Dict, List
+
+import pytest  # noqa
+from fastapi.testclient import TestClient
+from pytest_bdd import given, parsers, scenarios, then, when
+from requests.models import Response
+
+from app.db.pagination import encode_cursor
+from app.tests.utils.utils import tweak_config
+
+scenarios("features/users_pagination.feature")
+
+URL = "/users/"
+
+
+def _ids(response: Response) -> List[int]:
+    return [user["id"] for user in response.json()]
+
+
+# -----------------------------------------------------------------------------
+# GIVEN…
+# For generic @given, see conftest.py
+# -----------------------------------------------------------------------------
+
+@given(parsers.parse("The server sends at most {n:d} users per page"))
+def max_limit(n: int) -> None:
+    """Lower the maximum page size"""
+    yield from tweak_config("PAGINATION_MAX_LIMIT", n)
+
+
+# -----------------------------------------------------------------------------
+# WHEN
+# -----------------------------------------------------------------------------
+
+@when(parsers.parse("I retrieve all the users by pages of {limit:d}"))
+def get_all_users(
+    get: Callable,
+    context: Dict,
+    limit: int,
+) -> None:
+    """Follow the next cursors until the last page, keep the ids"""
+    context.data = []
+    params = {"limit": limit}
+    while True:
+        context.response = get(URL, params=params)
+        context.data += _ids(context.response)
+        if "X-Next-Cursor" not in context.response.headers:
+            break
+        params = {"limit": limit, "cursor": context.response.headers["X-Next-Cursor"]}
+
+
+@when(parsers.parse("I retrieve the first {limit:d} users"))
+def get_first_users(
+    get: Callable,
+    context: Dict,
+    limit: int,
+) -> None:
+    context.response = get(URL, params={"limit": limit})
+
+
+@when(parsers.parse('I retrieve the first {limit:d} users ordered by "{order_by}"'))
+def get_first_users_ordered_by(
+    get: Callable,
+    context: Dict,
+    limit: int,
+    order_by: str,
+) -> None:
+    context.response = get(URL, params={"limit": limit, "order_by": order_by})
+
+
+@when(parsers.parse("I retrieve the next {limit:d} users"))
+def get_next_users(
+    get: Callable,
+    context: Dict,
+    limit: int,
+) -> None:
+    """Follow the next cursor, the previous page is kept in the context"""
+    context.data = _ids(context.response)
+    cursor = context.response.headers["X-Next-Cursor"]
+    context.response = get(URL, params={"limit": limit, "cursor": cursor})
+
+
+@when(parsers.parse('I retrieve the next {limit:d} users ordered by "{order_by}"'))
+def get_next_users_ordered_by(
+    get: Callable,
+    context: Dict,
+    limit: int,
+    order_by: str,
+) -> None:
+    """Follow the next cursor, the previous page is kept in the context"""
+    context.data = _ids(context.response)
+    cursor = context.response.headers["X-Next-Cursor"]
+    context.response = get(URL, params={"limit": limit, "order_by": order_by, "cursor": cursor})
+
+
+@when(parsers.parse("I retrieve the previous {limit:d} users"))
+def get_previous_users(
+    get: Callable,
+    context: Dict,
+    limit: int,
+) -> None:
+    cursor = context.response.headers["X-Prev-Cursor"]
+    context.response = get(URL, params={"limit": limit, "cursor": cursor})
+
+
+@when(parsers.parse('I retrieve the users with the cursor "{cursor}"'))
+def get_users_with_cursor(
+    get: Callable,
+    context: Dict,
+    cursor: str,
+) -> None:
+    context.response = get(URL, params={"cursor": cursor})
+
+
+@when(parsers.parse('I retrieve the users ordered by "{order_by}"'))
+def get_users_ordered_by(
+    get: Callable,
+    context: Dict,
+    order_by: str,
+) -> None:
+    context.response = get(URL, params={"order_by": order_by})
+
+
+@when(parsers.parse('I retrieve the users ordered by "{order_by}" with a cursor on "{column}"'))
+def get_users_with_another_cursor(
+    get: Callable,
+    context: Dict,
+    order_by: str,
+    column: str,
+) -> None:
+    """Send a cursor made for another order"""
+    context.response = get(URL, params={"order_by": order_by, "cursor": encode_cursor(column, [2])})
+
+
+@when(parsers.parse("I retrieve the page {page:d} of {limit:d} users"))
+def get_users_page(
+    get: Callable,
+    context: Dict,
+    page: int,
+    limit: int,
+) -> None:
+    context.response = get(URL, params={"page": page, "limit": limit})
+
+
+@when("I follow the next link")
+def follow_next_link(
+    client: TestClient,
+    headers: Dict,
+    context: Dict,
+) -> None:
+    context.response = client.get(context.response.links["next"]["url"], headers=headers)
+
+
+# -----------------------------------------------------------------------------
+# THEN
+# -----------------------------------------------------------------------------
+
+@then("I should have retrieved every user in order")
+def check_all_users(
+    data: List[int],
+    users: Dict,
+) -> None:
+    assert data == sorted(user["id"] for user in users)
+
+
+@then(parsers.parse("The list should contain the users {start:d} to {end:d}"))
+def check_users_range(
+    response: Response,
+    users: Dict,
+    start: int,
+    end: int,
+) -> None:
+    assert _ids(response) == [user["id"] for user in users[start - 1:end]]
+
+
+@then(parsers.parse("The list should contain {n:d} users"))
+def check_users_count(
+    response: Response,
+    n: int,
+) -> None:
+    assert len(response.json()) == n
+
+
+@then("The response should not have a previous cursor")
+def check_no_previous_cursor(
+    response: Response,
+) -> None:
+    assert "X-Prev-Cursor" not in response.headers
+
+
+@then("The two pages should not share any user")
+def check_distinct_pages(
+    response: Response,
+    data: List[int],
+) -> None:
+    assert data
+    assert not set(data) & set(_ids(response))
+
+
+@then("The total count should be the number of users")
+def check_total_count(
+    response: Response,
+    users: Dict,
+) -> None:
+    assert response.headers["X-Total-Count"] == str(len(users))
+
+
+@then("The response should link to the next page")
+def check_next_link(
+    response: Response,
+) -> None:
+    assert 'rel="next"' in response.headers["Link"]
+
+
+@then("The response should not link to the previous page")
+def check_no_previous_link(
+    response: Response,
+) -> None:
+    assert 'rel="prev"' not in response.headers["Link"]
+
+
+@then("The previous link should use the previous cursor")
+def check_previous_link(
+    response: Response,
+) -> None:
+    cursor = response.headers["X-Prev-Cursor"]
+    assert response.links["prev"]["url"].endswith(f"cursor={cursor}&limit=2")
+
+
+@then("The response should link to the first, previous, next and last pages")
+def check_page_links(
+    response: Response,
+    users: Dict,
+) -> None:
+    last = -(-len(users) // 2)
+    assert response.links["first"]["url"].endswith("page=1&limit=2")
+    assert response.links["prev"]["url"].endswith("page=1&limit=2")
+    assert response.links["next"]["url"].endswith("page=3&limit=2")
+    assert response.links["last"]["url"].endswith(f"page={last}&limit=2")
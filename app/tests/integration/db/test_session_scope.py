@@ -0,0 +1,117 @@
+"""Concurrent requests must not share their session"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.concurrency import run_in_threadpool
+
+from app.core import config
+from app.db.session import SessionScope, _current_scope, session_scope
+from app.main import app
+from app.models.user import User
+
+REQUESTS = 16
+SESSION_URL = f"{config.API_V1_STR}/tests/session"
+
+
+@pytest.fixture
+def request_scopes(monkeypatch):
+    """The scoping of the application, the tests share one session"""
+    monkeypatch.setattr(SessionScope.registry, "scopefunc", _current_scope)
+    scopes = []
+    yield scopes
+    assert not any(scope in SessionScope.registry.registry for scope in scopes), \
+        "request sessions must be removed"
+
+
+def _request(number: int, user_id: int, barrier: threading.Barrier, scopes) -> int:
+    """What a request does: a session bound to its scope, removed at the end"""
+    scope = object()
+    scopes.append(scope)
+    token = session_scope.set(scope)
+    try:
+        session = SessionScope()
+        user = User.find_or_fail(user_id)
+        barrier.wait()
+        # a change that is never flushed stays in the identity map
+        user.full_name = f"request {number}"
+        barrier.wait()
+        assert User.session() is session
+        assert User.find_or_fail(user_id).full_name == f"request {number}"
+        assert session.is_modified(user)
+        return id(session)
+    finally:
+        SessionScope.remove()
+        session_scope.reset(token)
+
+
+@pytest.mark.usefixtures("db")
+def test_concurrent_requests_are_isolated(users: Dict, request_scopes):
+    """Each request of the threadpool should get its own session"""
+    barrier = threading.Barrier(REQUESTS, timeout=10)
+    with ThreadPoolExecutor(max_workers=REQUESTS) as executor:
+        futures = [
+            executor.submit(_request, n, users[1]["id"], barrier, request_scopes)
+            for n in range(REQUESTS)
+        ]
+        sessions = [future.result() for future in futures]
+    assert len(set(sessions)) == REQUESTS
+
+
+@pytest.mark.usefixtures("db")
+def test_threadpool_uses_the_session_of_the_request(request_scopes):
+    """The endpoint thread and the event loop should share the session of a
+    request, concurrent requests on the same loop should not"""
+
+    async def request():
+        scope = object()
+        request_scopes.append(scope)
+        token = session_scope.set(scope)
+        try:
+            session = SessionScope()
+            await asyncio.sleep(0)
+            assert await run_in_threadpool(SessionScope) is session
+            return id(session)
+        finally:
+            SessionScope.remove()
+            session_scope.reset(token)
+
+    async def requests():
+        return await asyncio.gather(*(request() for _ in range(REQUESTS)))
+
+    loop = asyncio.new_event_loop()
+    try:
+        sessions = loop.run_until_complete(requests())
+    finally:
+        loop.close()
+    assert len(set(sessions)) == REQUESTS
+
+
+@pytest.fixture
+def request_sessions(users: Dict, request_scopes) -> List:
+    """Add a route that records the scope and the session of each request"""
+    sessions = []
+
+    def request_session():
+        request_scopes.append(session_scope.get())
+        sessions.append(SessionScope())
+        return User.find_or_fail(users[0]["id"]).email
+
+    app.add_api_route(SESSION_URL, request_session)
+    route = app.router.routes[-1]
+    yield sessions
+    app.router.routes.remove(route)
+
+
+@pytest.mark.usefixtures("db")
+def test_requests_get_their_own_session(client: TestClient, request_sessions: List, request_scopes):
+    """Each request of the application should use a session of its own,
+    removed by db_session_middleware"""
+    for _ in range(2):
+        assert client.get(SESSION_URL).status_code == 200
+        assert request_scopes[-1] not in SessionScope.registry.registry
+    assert None not in request_scopes
+    assert request_sessions[0] is not request_sessions[1]
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from app.api.utils.encoders import RowEncoder
+from app.schemas.user import User
+
+
+pytestmark = pytest.mark.unitary
+
+
+class Sample(BaseModel):
+    id: int
+    name: Optional[str]
+    created: datetime
+
+
+def test_row_encoder():
+    """It should map the row values to the schema fields"""
+    encoder = RowEncoder(Sample)
+    assert encoder.columns == ["id", "name", "created"]
+    rows = [(1, "one", datetime(2020, 1, 2, 3, 4)), (2, None, datetime(2020, 1, 3))]
+    assert json.loads(encoder.encode(rows)) == [
+        {"id": 1, "name": "one", "created": "2020-01-02T03:04:00"},
+        {"id": 2, "name": None, "created": "2020-01-03T00:00:00"},
+    ]
+
+
+def test_row_encoder_ignores_extra_columns():
+    """It should ignore the columns after the schema fields"""
+    encoder = RowEncoder(Sample)
+    row = (1, "one", datetime(2020, 1, 2), "extra")
+    assert list(json.loads(encoder.encode([row]))[0]) == ["id", "name", "created"]
+
+
+def test_user_encoder_columns():
+    """It should only select the fields of the response schema"""
+    assert "hashed_password" not in RowEncoder(User).columns
@@ -0,0 +1,70 @@
+import pytest
+
+from app.core.cache import CountCache, SnapshotCache
+from app.tests.utils.utils import Clock
+
+
+pytestmark = pytest.mark.unitary
+
+
+def test_cache_get_set():
+    """It should return a copy of the cached snapshot"""
+    cache = SnapshotCache(maxsize=10, ttl=60)
+    cache.set(1, {"id": 1})
+    snapshot = cache.get(1)
+    snapshot["id"] = 2
+    assert cache.get(1) == {"id": 1}
+    assert cache.get(2) is None
+
+
+def test_cache_invalidate():
+    """It should forget invalidated entries"""
+    cache = SnapshotCache(maxsize=10, ttl=60)
+    cache.set(1, {"id": 1})
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_cache_is_bounded():
+    """It should evict entries above the max size"""
+    cache = SnapshotCache(maxsize=2, ttl=60)
+    for i in range(3):
+        cache.set(i, {"id": i})
+    assert len([i for i in range(3) if cache.get(i)]) == 2
+
+
+def test_cache_disabled():
+    """It should not store anything when the ttl is 0"""
+    cache = SnapshotCache(maxsize=10, ttl=0)
+    cache.set(1, {"id": 1})
+    assert cache.get(1) is None
+
+
+def test_count_cache_incr():
+    """It should adjust cached counts only"""
+    cache = CountCache(ttl=60)
+    cache.incr("user")
+    assert cache.get("user") is None
+    cache.set("user", 2)
+    cache.incr("user")
+    cache.incr("user", -5)
+    assert cache.get("user") == 0
+
+
+def test_count_cache_expires():
+    """It should expire counts even when they are adjusted"""
+    clock = Clock(0)
+    cache = CountCache(ttl=60, timer=clock)
+    cache.set("user", 2)
+    clock.now = 59
+    cache.incr("user")
+    assert cache.get("user") == 3
+    clock.now = 60
+    assert cache.get("user") is None
+
+
+def test_count_cache_disabled():
+    """It should not store anything when the ttl is 0"""
+    cache = CountCache(ttl=0)
+    cache.set("user", 2)
+    assert cache.get("user") is None
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from unittest import mock
+
+import pytest
+
+from app.core.security import PasswordHasher, PasswordHasherBusyError, _hash
+
+
+pytestmark = pytest.mark.unitary
+
+
+def run(coroutine):
+    # asyncio.run would unset the event loop used by the test client
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_hash_and_verify_inline():
+    """It should hash in the calling thread when no worker is set"""
+    hasher = PasswordHasher(workers=0)
+    hashed = hasher.hash("avalidpassword")
+    assert hasher.verify("avalidpassword", hashed)
+    assert not hasher.verify("wrong", hashed)
+    assert hasher.stats()["completed"] == 3
+
+
+def test_async_hash_inline_leaves_the_event_loop():
+    """It should hash in another thread when no worker is set"""
+    hasher = PasswordHasher(workers=0)
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def hash(password):
+        threads.append(threading.get_ident())
+        return _hash(password)
+
+    with mock.patch("app.core.security._hash", hash):
+        hashed = run(hasher.hash_async("avalidpassword"))
+    assert run(hasher.verify_async("avalidpassword", hashed))
+    assert threads and loop_thread not in threads
+    assert hasher.stats()["completed"] == 2
+
+
+def test_hash_and_verify_in_pool():
+    """It should hash in the worker processes"""
+    hasher = PasswordHasher(workers=1)
+    try:
+        hashed = run(hasher.hash_async("avalidpassword"))
+        assert run(hasher.verify_async("avalidpassword", hashed))
+        stats = hasher.stats()
+        assert stats["completed"] == 2
+        assert stats["pending"] == 0
+        assert stats["hash_time_avg_ms"] > 0
+    finally:
+        hasher.shutdown()
+
+
+def test_hash_queue_is_bounded():
+    """It should refuse new hashes when the queue is full"""
+    hasher = PasswordHasher(workers=1, max_queue=1)
+
+    async def burst():
+        return await asyncio.gather(
+            hasher.hash_async("avalidpassword"),
+            hasher.hash_async("avalidpassword"),
+            return_exceptions=True,
+        )
+
+    try:
+        results = run(burst())
+        assert any(isinstance(r, PasswordHasherBusyError) for r in results)
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher.shutdown()
+
+
+def test_hash_many_stays_in_queue_limit():
+    """It should hash a batch without being refused by a small queue"""
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    try:
+        hashes = run(hasher.hash_many_async(["password1", "password2", "password3"]))
+        assert len(hashes) == 3
+        assert hasher.verify("password3", hashes[2])
+        assert hasher.stats()["rejected"] == 0
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,138 @@
+import hashlib
+
+import pytest
+import pwnedpass
+
+from app.core.pwned import (PREFIX_TABLE_SIZE, PwnedPasswordCorpus,
+                            PwnedPasswordFilter, PwnedPasswordIndex,
+                            get_pwned_index)
+
+
+pytestmark = pytest.mark.unitary
+
+# entries must be sorted, they are in the last two prefixes so that the
+# prefix table is made of zeros and the test file can stay sparse
+ENTRIES = [
+    (b"\xff\xff\xfe" + b"\x01" * 17, 3),
+    (b"\xff\xff\xfe" + b"\x02" * 17, 1),
+    (b"\xff\xff\xff" + b"\x01" * 17, 42),
+]
+
+
+@pytest.fixture
+def pwned_db(tmp_path):
+    path = tmp_path / "pwned.bin"
+    with open(path, "wb") as f:
+        # the prefix 0xffffff starts after the two entries of 0xfffffe
+        f.seek(PREFIX_TABLE_SIZE - 8)
+        f.write((2 * 21).to_bytes(8, byteorder="big"))
+        for digest, count in ENTRIES:
+            f.write(digest[3:] + count.to_bytes(4, byteorder="big"))
+    return str(path)
+
+
+def test_count(pwned_db):
+    """It should return the count of every known digest"""
+    index = PwnedPasswordIndex(pwned_db)
+    for digest, count in ENTRIES:
+        assert index.count(digest) == count
+        with open(pwned_db, "rb") as f:
+            assert pwnedpass.search(f, digest) == count
+
+
+def test_unknown_digest(pwned_db):
+    """It should not find unknown or misaligned digests"""
+    index = PwnedPasswordIndex(pwned_db)
+    assert b"\x00" * 20 not in index
+    assert b"\xff\xff\xfe" + b"\x03" * 17 not in index
+    assert b"\xff\xff\xfe" + b"\x01" * 16 + b"\x00" not in index
+
+
+def test_invalid_file(tmp_path):
+    """It should refuse a file without prefix table"""
+    path = tmp_path / "invalid.bin"
+    path.write_bytes(b"\x00" * 10)
+    with pytest.raises(ValueError):
+        PwnedPasswordIndex(str(path))
+
+
+def test_digests(pwned_db):
+    """It should iterate over all the digests in order"""
+    index = PwnedPasswordIndex(pwned_db)
+    assert len(index) == len(ENTRIES)
+    assert list(index.digests()) == [digest for digest, _ in ENTRIES]
+
+
+def test_filter_has_no_false_negative(pwned_db, tmp_path):
+    """It should contain every digest of the database, saved or not"""
+    index = PwnedPasswordIndex(pwned_db)
+    bloom = PwnedPasswordFilter.build(index.digests(), len(index), 0.01)
+    path = str(tmp_path / "pwned.bloom")
+    bloom.save(path)
+    loaded = PwnedPasswordFilter.load(path)
+    for digest, _ in ENTRIES:
+        assert digest in bloom
+        assert digest in loaded
+
+
+def test_filter_false_positive_rate():
+    """It should reject most unknown digests"""
+    digests = [hashlib.sha1(str(i).encode()).digest() for i in range(2000)]
+    bloom = PwnedPasswordFilter.build(digests, len(digests), 0.01)
+    others = [hashlib.sha1(f"other{i}".encode()).digest() for i in range(2000)]
+    false_positives = sum(digest in bloom for digest in others)
+    assert bloom.false_positive_rate() == pytest.approx(0.01, rel=0.2)
+    assert false_positives < 2000 * 0.03
+
+
+def test_filter_memory_budget():
+    """It should never be larger than the memory budget"""
+    size, hashes = PwnedPasswordFilter.parameters(10 ** 6, 0.001, max_bytes=1024)
+    assert size == 1024 * 8
+    assert hashes == 1
+
+
+@pytest.fixture
+def digests():
+    return sorted(hashlib.sha1(str(i).encode()).digest() for i in range(5000))
+
+
+@pytest.mark.parametrize("hash_bytes", [6, 8, 10])
+def test_compact_corpus(digests, tmp_path, hash_bytes):
+    """It should find every digest of the corpus and no unknown digest"""
+    path = str(tmp_path / "pwned.compact")
+    PwnedPasswordCorpus.build(digests, path, hash_bytes=hash_bytes, block_size=16)
+    corpus = PwnedPasswordCorpus(path)
+    assert len(corpus) == len(digests)
+    for digest in digests:
+        assert digest in corpus
+    others = [hashlib.sha1(f"other{i}".encode()).digest() for i in range(5000)]
+    assert not any(digest in corpus for digest in others)
+    # the keys take about (8 * hash_bytes - log2(n)) / 7 bytes instead of 20
+    assert (tmp_path / "pwned.compact").stat().st_size < len(digests) * (hash_bytes + 2)
+
+
+def test_compact_corpus_false_match(digests, tmp_path):
+    """It should match digests sharing the truncated bytes, at the documented rate"""
+    path = str(tmp_path / "pwned.compact")
+    PwnedPasswordCorpus.build(digests, path, hash_bytes=6)
+    corpus = PwnedPasswordCorpus(path)
+    assert digests[0][:6] + b"\x00" * 14 in corpus
+    assert corpus.false_match_rate(len(corpus), 6) == len(digests) / 2 ** 48
+
+
+def test_compact_corpus_from_database(pwned_db, tmp_path):
+    """It should be opened in place of the pwnedpass database"""
+    path = str(tmp_path / "pwned.compact")
+    PwnedPasswordCorpus.build(PwnedPasswordIndex(pwned_db).digests(), path)
+    corpus = get_pwned_index(path)
+    assert isinstance(corpus, PwnedPasswordCorpus)
+    for digest, _ in ENTRIES:
+        assert digest in corpus
+    assert b"\x00" * 20 not in corpus
+
+
+def test_compact_corpus_hash_bytes(tmp_path):
+    """It should refuse truncations out of the 6-10 bytes range"""
+    with pytest.raises(ValueError):
+        PwnedPasswordCorpus.build([], str(tmp_path / "pwned.compact"), hash_bytes=4)
@@ -0,0 +1,84 @@
+import socket
+from unittest import mock
+
+import emails
+import pytest
+from emails.backend.smtp.backend import SMTPBackend
+
+from app.core.smtp import SMTPPool
+from app.tests.utils.smtp_sink import SMTPSink
+from app.tests.utils.utils import Clock
+
+
+pytestmark = pytest.mark.unitary
+
+# the smtp_server fixture replaces sendmail for the rest of the session
+sendmail = SMTPBackend.sendmail
+
+
+@pytest.fixture
+def sink():
+    with mock.patch.object(SMTPBackend, "sendmail", sendmail), SMTPSink() as sink:
+        yield sink
+
+
+def _pool(sink: SMTPSink, **kwargs) -> SMTPPool:
+    return SMTPPool(lambda: {"host": sink.host, "port": sink.port}, **kwargs)
+
+
+def _send(pool: SMTPPool) -> None:
+    message = emails.Message(subject="Hello", html="<p>Hello</p>", mail_from="test@fastapi.test")
+    with pool.connection() as backend:
+        assert message.send(to="mymail@fastapi.test", smtp=backend).success
+
+
+def test_connections_are_reused(sink: SMTPSink):
+    """It should send every message on the same connection"""
+    pool = _pool(sink, size=2)
+    for _ in range(5):
+        _send(pool)
+    pool.close()
+    assert sink.messages == 5
+    assert sink.connections == 1
+    assert pool.stats()["reused"] == 4
+
+
+def test_no_pool(sink: SMTPSink):
+    pool = _pool(sink, size=0)
+    for _ in range(3):
+        _send(pool)
+    assert sink.connections == 3
+
+
+def test_idle_connections_expire(sink: SMTPSink):
+    """It should close the connections idle for too long"""
+    clock = Clock()
+    pool = _pool(sink, size=2, idle_timeout=60, timer=clock)
+    _send(pool)
+    clock.now += 61
+    _send(pool)
+    assert sink.connections == 2
+    assert pool.stats()["discarded"] == 1
+
+
+def test_lost_connections_are_replaced(sink: SMTPSink):
+    """It should check an idle connection before reusing it"""
+    clock = Clock()
+    pool = _pool(sink, size=2, idle_timeout=60, check_after=5, timer=clock)
+    _send(pool)
+    # the server closed the connection
+    pool._idle[0]._client.sock.shutdown(socket.SHUT_RDWR)
+    clock.now += 10
+    _send(pool)
+    assert sink.messages == 2
+    assert sink.connections == 2
+    assert pool.stats()["discarded"] == 1
+
+
+def test_connection_is_dropped_on_error(sink: SMTPSink):
+    pool = _pool(sink, size=2)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as backend:
+            backend.get_client()
+            raise RuntimeError()
+    assert pool.stats()["idle"] == 0
@@ -0,0 +1,53 @@
+import pytest
+
+from app.core.throttle import LoginThrottle, SlidingWindow
+from app.tests.utils.utils import Clock
+
+
+pytestmark = pytest.mark.unitary
+
+
+def test_sliding_window():
+    """It should block a key once the limit is reached during the period"""
+    clock = Clock()
+    window = SlidingWindow(limit=2, period=60, timer=clock)
+    window.hit("key")
+    assert window.retry_after("key") == 0
+    clock.now += 10
+    window.hit("key")
+    assert window.retry_after("key") == 50
+    clock.now += 50
+    assert window.retry_after("key") == 0
+    assert window.count("key") == 1
+
+
+def test_sliding_window_disabled():
+    """It should never block when the limit is 0"""
+    window = SlidingWindow(limit=0, period=60)
+    for i in range(10):
+        window.hit("key")
+    assert window.retry_after("key") == 0
+
+
+def test_login_throttle():
+    """It should throttle accounts and clients independently"""
+    throttle = LoginThrottle(account_limit=2, client_limit=3, period=60, timer=Clock())
+    throttle.failure("Mymail@fastapi.test", "1.2.3.4")
+    throttle.failure("mymail@fastapi.test", "5.6.7.8")
+    assert throttle.retry_after("MYMAIL@fastapi.test", "9.9.9.9")
+    assert not throttle.retry_after("other@fastapi.test", "1.2.3.4")
+
+    throttle.success("mymail@fastapi.test")
+    assert not throttle.retry_after("mymail@fastapi.test", "9.9.9.9")
+
+    throttle.failure("other@fastapi.test", "1.2.3.4")
+    throttle.failure("another@fastapi.test", "1.2.3.4")
+    assert throttle.retry_after("new@fastapi.test", "1.2.3.4")
+
+
+def test_login_throttle_normalizes_emails():
+    """Spaces around the email should not open a new account window"""
+    throttle = LoginThrottle(account_limit=2, client_limit=0, period=60, timer=Clock())
+    throttle.failure("mymail@fastapi.test", "1.2.3.4")
+    throttle.failure(" MyMail@fastapi.test", "1.2.3.4")
+    assert throttle.retry_after("mymail@fastapi.test ", "5.6.7.8")
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+
+from app.core import config
+from app.db.pool import InstrumentedQueuePool, ping_idle_connections
+from app.db.session import create_pooled_engine
+
+
+pytestmark = pytest.mark.unitary
+
+
+def _pool(**kwargs) -> InstrumentedQueuePool:
+    return InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), **kwargs)
+
+
+def test_pool_stats():
+    """It should report checked out connections and checkout waits"""
+    pool = _pool(pool_size=1, max_overflow=1, timeout=0.01)
+    first, second = pool.connect(), pool.connect()
+    stats = pool.stats()
+    assert stats["checked_out"] == 2
+    assert stats["overflow"] == 1
+    assert stats["checkouts"] == 2
+
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["wait_max_ms"] >= 10
+
+    first.close()
+    second.close()
+    assert pool.stats()["checked_out"] == 0
+
+
+def test_pool_stats_kept_on_dispose():
+    """It should keep the counters when the pool is recreated"""
+    pool = _pool(pool_size=1)
+    pool.connect().close()
+    assert pool.recreate().stats()["checkouts"] == 1
+
+
+def test_ping_idle_connections():
+    """It should replace a dead idle connection on checkout"""
+    pool = _pool(pool_size=1, max_overflow=0)
+    ping_idle_connections(pool, 0)
+
+    connection = pool.connect()
+    dbapi_connection = connection.connection
+    connection.close()
+    dbapi_connection.close()
+
+    connection = pool.connect()
+    assert connection.connection is not dbapi_connection
+    connection.cursor().execute("SELECT 1")
+    connection.close()
+
+
+def test_sqlite_engine_follows_the_ping_settings(monkeypatch):
+    """It should apply the ping settings to sqlite too"""
+    monkeypatch.setattr(config, "DB_POOL_PRE_PING", False)
+    engine = create_pooled_engine("sqlite://")
+    assert not engine.pool._pre_ping
+    assert not engine.pool.dispatch.checkout
+
+    monkeypatch.setattr(config, "DB_POOL_PRE_PING", True)
+    monkeypatch.setattr(config, "DB_POOL_PING_INTERVAL", 30)
+    engine = create_pooled_engine("sqlite://")
+    assert not engine.pool._pre_ping
+    assert engine.pool.dispatch.checkout
@@ -0,0 +1,132 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, exc
+from sqlalchemy.ext.declarative import declarative_base
+
+from app.db.routing import PrimaryPins, ReplicaRouter, RoutingSession, replica_reads
+from app.tests.utils.utils import Clock
+
+
+pytestmark = pytest.mark.unitary
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "item"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+def _database(path, name: str):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.execute(Item.__table__.insert(), {"id": 1, "name": name})
+    return engine
+
+
+@pytest.fixture
+def databases(tmp_path):
+    """A primary and two replicas, in sqlite files"""
+    return [_database(tmp_path / f"{name}.db", name) for name in ("primary", "replica1", "replica2")]
+
+
+@pytest.fixture
+def read_intent():
+    token = replica_reads.set(True)
+    yield
+    replica_reads.reset(token)
+
+
+def _name(session) -> str:
+    return session.query(Item.name).filter_by(id=1).scalar()
+
+
+def test_writes_use_the_primary(databases):
+    """It should use the primary when the request cannot read from a replica"""
+    primary, *replicas = databases
+    session = RoutingSession(bind=primary, router=ReplicaRouter(replicas))
+    assert _name(session) == "primary"
+
+
+@pytest.mark.usefixtures("read_intent")
+def test_reads_use_the_replicas_in_turn(databases):
+    """It should send the reads to each replica in turn"""
+    primary, *replicas = databases
+    session = RoutingSession(bind=primary, router=ReplicaRouter(replicas))
+    names = set()
+    for _ in range(2):
+        names.add(_name(session))
+        session.rollback()
+    assert names == {"replica1", "replica2"}
+
+
+@pytest.mark.usefixtures("read_intent")
+def test_a_transaction_reads_from_one_replica(databases):
+    """It should keep the replica of the first query until the transaction ends"""
+    primary, *replicas = databases
+    session = RoutingSession(bind=primary, router=ReplicaRouter(replicas))
+    binds = {session.get_bind(Item) for _ in range(4)}
+    assert [_name(session) for _ in range(4)] == [_name(session)] * 4
+    assert len(binds) == 1
+    session.rollback()
+    assert session.get_bind(Item) not in binds
+
+
+@pytest.mark.usefixtures("read_intent")
+def test_reads_after_a_flush_use_the_primary(databases):
+    """It should read its own writes until the end of the transaction"""
+    primary, *replicas = databases
+    session = RoutingSession(bind=primary, router=ReplicaRouter(replicas[:1]))
+    session.add(Item(id=2, name="new"))
+    session.flush()
+    assert _name(session) == "primary"
+    assert session.query(Item).count() == 2
+    session.rollback()
+    assert _name(session) == "replica1"
+
+
+def test_router_skips_replicas_down():
+    """It should skip a replica that is down until the retry interval"""
+    clock = Clock()
+    replicas = [create_engine("sqlite://"), create_engine("sqlite://")]
+    router = ReplicaRouter(replicas, retry_interval=30, timer=clock)
+    router.mark_down(replicas[0])
+    assert [router.get() for _ in range(3)] == [replicas[1]] * 3
+    clock.now += 30
+    assert {router.get() for _ in range(2)} == set(replicas)
+
+
+def test_router_marks_replicas_that_fail(tmp_path, databases):
+    """It should mark a replica down when it cannot connect"""
+    broken = create_engine(f"sqlite:///{tmp_path}/missing/replica.db")
+    router = ReplicaRouter([broken, databases[1]])
+    with pytest.raises(exc.OperationalError):
+        router.get().connect()
+    assert router.get() is databases[1]
+    assert router.get() is databases[1]
+    assert router.get() is databases[1]
+
+
+@pytest.mark.usefixtures("read_intent")
+def test_no_replica_uses_the_primary(databases):
+    session = RoutingSession(bind=databases[0], router=ReplicaRouter([]))
+    assert _name(session) == "primary"
+
+
+def test_primary_pins():
+    pins = PrimaryPins(duration=5)
+    pins.pin("client")
+    assert "client" in pins
+    assert "other" not in pins
+    assert "client" not in PrimaryPins(duration=0)
+
+
+def test_primary_pins_any_key_of_a_client():
+    """A write without a token should pin the reads that send one"""
+    pins = PrimaryPins(duration=5)
+    pins.pin("10.0.0.1")
+    assert pins.pinned("10.0.0.1", "Bearer token")
+    assert not pins.pinned("10.0.0.2", "Bearer token")
+    pins.pin("10.0.0.2", "Bearer other")
+    assert pins.pinned("10.0.0.3", "Bearer other")
+    assert not pins.pinned()
@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.db.session import create_pooled_engine, engine
+from app.db.sqlite import apply_pragmas, sqlite_pragmas, writing
+
+
+pytestmark = pytest.mark.unitary
+
+
+def _pragma(bind, name: str):
+    return bind.execute(f"PRAGMA {name}").scalar()
+
+
+def test_application_engine_uses_the_profile():
+    """It should apply the configured profile to the sqlite engine"""
+    assert _pragma(engine, "journal_mode") == "wal"
+    assert _pragma(engine, "synchronous") == 1  # NORMAL
+    assert _pragma(engine, "busy_timeout") == 5000
+    assert _pragma(engine, "cache_size") == -64000
+    assert _pragma(engine, "temp_store") == 2  # MEMORY
+
+
+def test_pragmas_are_applied_on_connect(tmp_path):
+    """It should set the pragmas on every new connection"""
+    file_engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    apply_pragmas(file_engine, {"journal_mode": "WAL", "busy_timeout": 1234})
+    connections = [file_engine.connect(), file_engine.connect()]
+    assert [_pragma(c, "busy_timeout") for c in connections] == [1234, 1234]
+    assert _pragma(connections[0], "journal_mode") == "wal"
+
+
+def test_empty_pragmas_keep_the_defaults(monkeypatch):
+    """It should ignore the empty settings"""
+    monkeypatch.setattr("app.core.config.SQLITE_JOURNAL_MODE", "")
+    pragmas = sqlite_pragmas()
+    assert "journal_mode" not in pragmas
+    assert pragmas["busy_timeout"] == 5000
+
+
+def test_concurrent_writers_wait_for_the_lock(tmp_path):
+    """Transactions that read then write should not fail with "database is
+    locked" when they begin in a writing() block"""
+    app_engine = create_pooled_engine(f"sqlite:///{tmp_path}/test.db")
+    app_engine.execute("CREATE TABLE counter (value INTEGER)")
+    app_engine.execute("INSERT INTO counter VALUES (0)")
+    threads, increments = 8, 25
+    barrier = threading.Barrier(threads, timeout=10)
+
+    def increment():
+        barrier.wait()
+        for _ in range(increments):
+            with writing(), app_engine.begin() as connection:
+                value = connection.execute("SELECT value FROM counter").scalar()
+                connection.execute("UPDATE counter SET value = ?", value + 1)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for future in [executor.submit(increment) for _ in range(threads)]:
+            future.result()
+    assert app_engine.execute("SELECT value FROM counter").scalar() == threads * increments
+    app_engine.dispose()
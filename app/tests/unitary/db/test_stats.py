@@ -0,0 +1,23 @@
+import pytest
+
+from app.db.session import engine
+from app.db.stats import QueryStats, query_stats
+
+
+pytestmark = pytest.mark.unitary
+
+
+def test_statements_outside_requests_are_ignored():
+    assert query_stats.get() is None
+    engine.execute("SELECT 1")
+
+
+def test_repeated_statements():
+    stats = QueryStats()
+    for i in range(3):
+        stats.record("SELECT * FROM user WHERE id = ?", 0.001)
+    stats.record("SELECT 1", 0.001)
+    assert stats.count == 4
+    assert stats.repeated(3) == [("SELECT * FROM user WHERE id = ?", 3)]
+    assert stats.repeated(0) == []
+    assert stats.server_timing() == 'db;dur=4.0;desc="4 queries"'
@@ -1,6 +1,10 @@
+from unittest import mock
+
 import pytest
 
-from app.utils import generate_password_reset_token, verify_password_reset_token
+from app.core import config
+from app.utils import (generate_password_reset_token, load_words,
+                       random_n_words, verify_password_reset_token)
 
 
 pytestmark = pytest.mark.unitary
@@ -27,3 +31,19 @@ def test_verify_password_reset_token_invalid():
     token = "wrong"
     result = verify_password_reset_token(token)
     assert result is None
+
+
+def test_random_n_words():
+    """It should join n words of the default dictionary"""
+    words = load_words(config.RANDOM_WORD_FILES[config.RANDOM_WORD_LOCALE])
+    password = random_n_words(4)
+    assert len(password.split("-")) == 4
+    assert all(word in words for word in password.split("-"))
+
+
+def test_random_n_words_locale(tmp_path):
+    """It should use the dictionary of the given locale"""
+    path = tmp_path / "words.en.txt"
+    path.write_text("MOON\n\n")
+    with mock.patch.dict(config.RANDOM_WORD_FILES, {"en": str(path)}):
+        assert random_n_words(2, locale="en") == "MOON-MOON"
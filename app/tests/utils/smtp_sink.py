@@ -0,0 +1,80 @@
+"""A local SMTP server that accepts every message and keeps none
+
+`connect_delay` is added to the greeting of each connection, to stand for
+the TLS handshake and the AUTH round trips of a real server.
+Example:
+    with SMTPSink(connect_delay=0.05) as sink:
+        send(host=sink.host, port=sink.port)
+        sink.connections, sink.messages
+"""
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+        self.wfile.flush()
+
+    def _data(self) -> None:
+        self._reply("354 End data with <CR><LF>.<CR><LF>")
+        for line in self.rfile:
+            if line.rstrip(b"\r\n") == b".":
+                break
+        self.server.sink.received()
+        self._reply("250 OK: queued")
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connected()
+        time.sleep(sink.connect_delay)
+        self._reply("220 sink ESMTP")
+        for line in self.rfile:
+            command = line.decode(errors="replace").strip().split(" ")[0].upper()
+            if command == "EHLO":
+                self._reply("250-sink")
+                self._reply("250 8BITMIME")
+            elif command == "DATA":
+                self._data()
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            elif command in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+
+    def __init__(self, connect_delay: float = 0):
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def received(self) -> None:
+        with self._lock:
+            self.messages += 1
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
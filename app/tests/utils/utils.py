@@ -7,3 +7,13 @@ def tweak_config(key, value):
     setattr(config, key, value)
     yield config
     setattr(config, key, before)
+
+
+class Clock:
+    """Fake timer, moved forward by setting `now`"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
@@ -4,17 +4,20 @@ TODO: refactor mail sending helpers
 """
 import logging
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
-import random
 import emails
 import hashlib
-import pwnedpass
+import secrets
 from emails.template import JinjaTemplate
 from jose import jwt
 
 from app.core import config
+from app.core.pwned import get_pwned_filter, get_pwned_index
+from app.core.smtp import smtp_pool
+from app.models.email_outbox import EmailOutbox
 
 
 def send_email(
@@ -23,21 +26,20 @@ def send_email(
     html_template: str = "",
     environment: Dict[str, Any] = {},
 ) -> None:
-    """Send a generic email"""
+    """Send a generic email, through the outbox when it is enabled"""
     assert config.EMAILS_ENABLED, "no provided configuration for email variables"
     message = emails.Message(
         subject=JinjaTemplate(subject_template),
         html=JinjaTemplate(html_template),
         mail_from=(config.EMAILS_FROM_NAME, config.EMAILS_FROM_EMAIL),
     )
-    smtp_options = {"host": config.SMTP_HOST, "port": config.SMTP_PORT}
-    if config.SMTP_TLS:
-        smtp_options["tls"] = True
-    if config.SMTP_USER:
-        smtp_options["user"] = config.SMTP_USER
-    if config.SMTP_PASSWORD:
-        smtp_options["password"] = config.SMTP_PASSWORD
-    response = message.send(to=email_to, render=environment, smtp=smtp_options)
+    if config.EMAILS_OUTBOX:
+        # sent by the outbox worker once the request is committed
+        message.render(**environment)
+        EmailOutbox.enqueue(email_to, message.subject, message.html_body)
+        return
+    with smtp_pool.connection() as backend:
+        response = message.send(to=email_to, render=environment, smtp=backend)
     logging.info(f"send email result: {response}")
 
 
@@ -203,21 +205,25 @@ def verify_email_confirmation_token(token) -> Tuple:
 
 
 def is_password_corrupted(password: str) -> bool:
-    with open(config.PASSWORD_DB_PATH, 'rb') as f:
-        if pwnedpass.search(f, hashlib.sha1(password.encode()).digest()):
-            return True
+    digest = hashlib.sha1(password.encode()).digest()
+    # the filter has no false negative, only its matches need to be checked
+    if config.PASSWORD_FILTER_PATH and digest not in get_pwned_filter(config.PASSWORD_FILTER_PATH):
         return False
+    return digest in get_pwned_index(config.PASSWORD_DB_PATH)
 
 
-def random_word():
-    with open(config.RANDOM_WORD_FILE) as f:
-        line = next(f)
-        for num, aline in enumerate(f, 2):
-            if random.randrange(num):
-                continue
-            line = aline
-        return line.strip()
+@lru_cache(maxsize=None)
+def load_words(path: str) -> Tuple[str, ...]:
+    """Load a word list once per process"""
+    with open(path) as f:
+        return tuple(word for word in (line.strip() for line in f) if word)
 
 
-def random_n_words(n=4):
-    return '-'.join(random_word() for i in range(0, n))
+def random_word(locale: str = None) -> str:
+    """Return a random word from the dictionary of the locale"""
+    words = load_words(config.RANDOM_WORD_FILES[locale or config.RANDOM_WORD_LOCALE])
+    return secrets.choice(words)
+
+
+def random_n_words(n=4, locale: str = None):
+    return '-'.join(random_word(locale) for i in range(0, n))
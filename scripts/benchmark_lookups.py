@@ -0,0 +1,53 @@
+"""Lookups by id and by email, built on every call or baked
+
+The users are loaded from an in-memory sqlite database, the identity map is
+emptied before each lookup so that every call runs its SQL.
+
+    python scripts/benchmark_lookups.py --number 5000
+"""
+import argparse
+import timeit
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db.base_class import Base, BaseModel
+from app.models.user import User
+
+USERS = 1000
+
+
+def setup() -> Session:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    engine.execute(
+        User.__table__.insert(),
+        [{"email": f"user{i}@fastapi.test"} for i in range(USERS)],
+    )
+    session = Session(bind=engine)
+    BaseModel.set_session(session)
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=5000)
+    args = parser.parse_args()
+
+    session = setup()
+    lookups = {
+        "get(email_normalized=)": lambda: User.get(email_normalized="user500@fastapi.test"),
+        "find_by(email_normalized)": lambda: User.find_by("email_normalized", "user500@fastapi.test"),
+        "query.get(id)": lambda: User.query.get(500),
+        "find_or_fail(id)": lambda: User.find_or_fail(500),
+    }
+    for name, lookup in lookups.items():
+        def run():
+            session.expunge_all()
+            lookup()
+        elapsed = timeit.timeit(run, number=args.number)
+        print(f"{name:28} {elapsed / args.number * 1e6:8.1f} µs per lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Messages per second with a new SMTP connection per message, or pooled
+
+The messages go to a local SMTP sink that waits --connect-delay seconds
+before greeting each connection, in place of the TLS handshake and AUTH of
+a real server.
+
+    python scripts/benchmark_smtp.py --messages 200 --threads 4 --connect-delay 0.05
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import emails
+from emails.backend.smtp.backend import SMTPBackend
+
+from app.core.smtp import SMTPPool
+from app.tests.utils.smtp_sink import SMTPSink
+
+
+def _message() -> emails.Message:
+    return emails.Message(subject="Hello", html="<p>Hello</p>", mail_from="test@fastapi.test")
+
+
+def run(name: str, send, messages: int, threads: int, sink: SMTPSink) -> None:
+    connections = sink.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: send(), range(messages)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:10} {messages / elapsed:8.1f} messages/s  "
+        f"{sink.connections - connections} connections  ({elapsed:.2f}s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--connect-delay", type=float, default=0.05, help="seconds")
+    args = parser.parse_args()
+
+    with SMTPSink(connect_delay=args.connect_delay) as sink:
+        options = {"host": sink.host, "port": sink.port}
+
+        def send_new_connection():
+            with SMTPBackend(**options) as backend:
+                _message().send(to="mymail@fastapi.test", smtp=backend)
+
+        pool = SMTPPool(lambda: options, size=args.threads)
+
+        def send_pooled():
+            with pool.connection() as backend:
+                _message().send(to="mymail@fastapi.test", smtp=backend)
+
+        run("new", send_new_connection, args.messages, args.threads, sink)
+        run("pooled", send_pooled, args.messages, args.threads, sink)
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
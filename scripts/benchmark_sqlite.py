@@ -0,0 +1,114 @@
+"""Concurrent signups and logins on sqlite, with and without the profile
+
+The database work of a signup (insert the user) and of a login (look up the
+email, then store the login counter) is run by several threads on a fresh
+database file, through the engine of the application (create_pooled_engine)
+and in writing transactions like the POST requests. bcrypt is left out, it
+would hide the database.
+
+    python scripts/benchmark_sqlite.py --threads 8 --operations 500
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import exc
+
+from app.core import config
+from app.db.base_class import Base
+from app.db.session import create_pooled_engine
+from app.db.sqlite import writing
+from app.models.user import User
+
+HASH = "$2b$12$4cJQnLQ5PHk6iTkQZV0T5OOXRvCxMcjdvOsJTRzRl8JrG2WR5r7gW"
+
+# emptied to keep the sqlite defaults
+PROFILE = [
+    "SQLITE_JOURNAL_MODE", "SQLITE_SYNCHRONOUS", "SQLITE_BUSY_TIMEOUT",
+    "SQLITE_MMAP_SIZE", "SQLITE_CACHE_SIZE", "SQLITE_TEMP_STORE",
+]
+
+
+def _signup(connection, email: str) -> None:
+    with connection.begin():
+        connection.execute(User.__table__.insert(), {"email": email, "hashed_password": HASH})
+
+
+def _login(connection, email: str) -> None:
+    table = User.__table__
+    with connection.begin():
+        user = connection.execute(
+            table.select().where(table.c.email_normalized == email)
+        ).first()
+        connection.execute(
+            table.update().where(table.c.id == user.id), {"login_retry": 0}
+        )
+
+
+def _worker(engine, thread: int, operations: int, errors: Dict) -> None:
+    connection = engine.connect()
+    with writing():
+        for i in range(operations):
+            email = f"user{thread}-{i}@fastapi.test"
+            try:
+                _signup(connection, email)
+                _login(connection, email)
+            except exc.OperationalError:
+                with errors["lock"]:
+                    errors["count"] += 1
+    connection.close()
+
+
+def _engine(url: str, profile: bool):
+    settings = {name: getattr(config, name) for name in PROFILE}
+    if not profile:
+        for name in PROFILE:
+            setattr(config, name, "")
+    try:
+        return create_pooled_engine(url)
+    finally:
+        for name, value in settings.items():
+            setattr(config, name, value)
+
+
+def run(name: str, profile: bool, threads: int, operations: int) -> None:
+    directory = tempfile.mkdtemp()
+    engine = _engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile)
+    Base.metadata.create_all(engine)
+
+    errors = {"count": 0, "lock": threading.Lock()}
+    workers = [
+        threading.Thread(target=_worker, args=(engine, t, operations, errors))
+        for t in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    total = threads * operations
+    print(
+        f"{name:8} {total / elapsed:8.0f} signups+logins/s  "
+        f"{errors['count']} locked  ({elapsed:.2f}s)"
+    )
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=200, help="per thread")
+    args = parser.parse_args()
+
+    # the sqlite defaults, as before the profile
+    run("default", False, args.threads, args.operations)
+    run("profile", True, args.threads, args.operations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Send the emails of the outbox, when EMAILS_OUTBOX_WORKER is False
+
+    python scripts/outbox_worker.py
+"""
+import logging
+import signal
+
+from app.core.outbox import outbox_worker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    logger.info("Sending the emails of the outbox")
+    signal.signal(signal.SIGTERM, lambda *args: outbox_worker.stop())
+    try:
+        outbox_worker.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()